@@ -7,8 +7,12 @@ Handles login, session management, and token generation.
 import os
 import requests
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Tuple
-from google.cloud import secretmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from config import config
 from logger import get_logger, get_auth_logger
@@ -17,6 +21,38 @@ from logger import get_logger, get_auth_logger
 logger = get_logger(__name__)
 auth_logger = get_auth_logger(logger)
 
+# Anti-forgery token as rendered in the dashboard page (hidden form field or inline JSON)
+_MVC_TOKEN_RE = re.compile(
+    r'name="__RequestVerificationToken"[^>]*value="([^"]+)"'
+    r'|"__RequestVerificationToken":"([^"]+)"'
+)
+_MVC_TOKEN_MARKER = "__RequestVerificationToken"
+
+# Login flow against a single host: (method, path, payload builder, needs anti-forgery token)
+_AUTH_STEPS = (
+    ("GET", "/HealthCare", None, False),
+    ("POST", "/HealthCare/SingleSignOn/GetAuthenticationDetail",
+     lambda email, password: {"User": email}, True),
+    ("POST", "/HealthCare/User/Login",
+     lambda email, password: {"User": email, "Password": password, "setPermissions": True}, True),
+    ("GET", "/core/scheduler/appointments", None, True),
+)
+
+# Cookie names that carry the anti-forgery token
+_TOKEN_COOKIE_RE = re.compile(r"XSRF|ANTIFORGERY|REQUESTVERIFICATIONTOKEN", re.IGNORECASE)
+
+
+def _find_mvc_token(text: str, start: int = 0) -> Optional[str]:
+    """Locate the MVC token with a literal scan, running the regex only around each hit."""
+    idx = text.find(_MVC_TOKEN_MARKER, start)
+    while idx >= 0:
+        match = _MVC_TOKEN_RE.search(text, max(0, idx - 64), idx + 512)
+        if match:
+            return match.group(1) or match.group(2)
+        idx = text.find(_MVC_TOKEN_MARKER, idx + len(_MVC_TOKEN_MARKER))
+    return None
+
+
 class RethinkAuthError(Exception):
     """Custom exception for Rethink authentication operations."""
     pass
@@ -28,20 +64,88 @@ class RethinkAuth:
         self.session = requests.Session()
         self.base_url = config.RETHINK_BASE_URL
         self.headers = config.get_rethink_headers()
+        self._configure_session()
         self._authenticated = False
-
-    def _get_secret(self, secret_name: str, project_id: Optional[str] = None) -> str:
-        """Retrieve secret from Google Cloud Secret Manager."""
+        self._auth_generation = 0  # Bumped on each successful login
+        self._mvc_token: Optional[str] = None
+        self._mvc_token_ts: float = 0.0
+        self._context_established: set[str] = set()
+        self._xsrf_cookie_name: Optional[str] = None
+        self._sm_client = None
+        self._secret_cache: Dict[Tuple[str, str], Tuple[str, float]] = {}  # (project, name) -> (value, fetched at)
+        self._local = threading.local()
+        self._auth_lock = threading.RLock()
+        self._build_header_templates()
+
+    def _configure_session(self) -> None:
+        """Mount a keep-alive connection pool with retry/backoff on the session."""
+        # Status and read retries re-send the request, so they are limited to idempotent
+        # methods; login and data POSTs are only retried on connect errors (never sent)
+        retry = Retry(
+            total=config.HTTP_MAX_RETRIES,
+            backoff_factor=config.HTTP_RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"])
+        )
+        # Never smaller than the concurrent page fetchers, or their connections get discarded
+        pool_size = max(config.HTTP_POOL_SIZE, config.FETCH_MAX_WORKERS)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            pool_block=False
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
+    def _build_header_templates(self) -> None:
+        """Prebuild the static part of the API request headers; only tokens vary per call."""
+        common = {
+            "Accept": "application/json, text/plain, */*",
+            "Content-Type": "application/json;charset=utf-8",
+            "User-Agent": self.headers["User-Agent"],
+            "X-Application-Key": self.headers["X-Application-Key"],
+            "X-Origin": self.headers["X-Origin"],
+        }
+        self._dashboard_tmpl = {
+            **common,
+            "Origin": self.base_url,
+            "Referer": f"{self.base_url}/Healthcare",
+        }
+        # None drops the session-level Origin/Referer, which scheduler requests never sent
+        self._scheduler_tmpl = {
+            **common,
+            "Origin": None,
+            "Referer": None,
+        }
+
+    def _get_secret_client(self):
+        """Return the Secret Manager client, creating it (and its gRPC channel) on first use."""
+        if self._sm_client is None:
+            # Imported lazily: gRPC/protobuf are only needed when env credentials are missing
+            from google.cloud import secretmanager
+            self._sm_client = secretmanager.SecretManagerServiceClient()
+        return self._sm_client
+
+    def _get_secret(self, secret_name: str, project_id: Optional[str] = None, client=None) -> str:
+        """Retrieve secret from Google Cloud Secret Manager, reusing values fetched within SECRET_CACHE_TTL."""
         try:
             if project_id is None:
                 project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
                 if not project_id:
                     raise RethinkAuthError("GOOGLE_CLOUD_PROJECT environment variable not set")
             
-            client = secretmanager.SecretManagerServiceClient()
+            cached = self._secret_cache.get((project_id, secret_name))
+            if cached and time.monotonic() - cached[1] < config.SECRET_CACHE_TTL:
+                return cached[0]
+            
+            client = client or self._get_secret_client()
             name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
             response = client.access_secret_version(request={"name": name})
-            return response.payload.data.decode("UTF-8")
+            value = response.payload.data.decode("UTF-8")
+            self._secret_cache[(project_id, secret_name)] = (value, time.monotonic())
+            return value
         except Exception as e:
             logger.error(f"Failed to retrieve secret {secret_name}")
             raise RethinkAuthError(f"Secret retrieval failed: {str(e)}")
@@ -55,28 +159,65 @@ class RethinkAuth:
             logger.debug("Using environment credentials")
             return email, password
 
-        # Fallback to Secret Manager
+        # Fallback to Secret Manager, fetching the missing secrets concurrently over one client
+        missing = [name for name, value in (("RTHINK_USER", email), ("RTHINK_PASS", password)) if not value]
         try:
-            email = email or self._get_secret("RTHINK_USER")
-            password = password or self._get_secret("RTHINK_PASS")
+            client = self._get_secret_client()
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                futures = {name: executor.submit(self._get_secret, name, client=client) for name in missing}
+                secrets = {name: future.result() for name, future in futures.items()}
+
+            email = email or secrets["RTHINK_USER"]
+            password = password or secrets["RTHINK_PASS"]
             logger.debug("Using Secret Manager credentials")
             return email, password
         except Exception as e:
             raise RethinkAuthError(f"Failed to get credentials: {e}")
 
     def _fetch_token(self) -> Optional[str]:
-        """Extract anti-forgery token from session cookies."""
-        for cookie in self.session.cookies:
-            if any(k in cookie.name.upper() for k in ("XSRF", "ANTIFORGERY", "REQUESTVERIFICATIONTOKEN")):
-                return cookie.value
-        return None
-
-    def _with_token(self, headers: dict) -> dict:
-        """Add anti-forgery token to headers."""
+        """
+        Extract anti-forgery token from session cookies.
+
+        The cookie name is remembered, but its value is read from the jar on every call,
+        so a token rotated by the server in place is never served stale.
+        """
+        token = None
+        # Look up the cookie that carried the token last time before scanning every name
+        if self._xsrf_cookie_name:
+            try:
+                token = self.session.cookies.get(self._xsrf_cookie_name)
+            except requests.cookies.CookieConflictError:
+                token = None
+
+        if not token:
+            for cookie in self.session.cookies:
+                if _TOKEN_COOKIE_RE.search(cookie.name):
+                    token = cookie.value
+                    self._xsrf_cookie_name = cookie.name
+                    break
+
+        return token
+
+    def _invalidate_xsrf_token(self) -> None:
+        """Force the next token lookup to rescan the cookie jar."""
+        self._xsrf_cookie_name = None
+
+    def _with_token(self) -> dict:
+        """
+        Return the standard headers with the anti-forgery token applied.
+
+        The dict is a per-thread buffer reused across calls; requests copies headers
+        when preparing a request, so callers must use it immediately and not keep it.
+        """
         token = self._fetch_token()
         if not token:
             raise RethinkAuthError("No anti-forgery token found in cookies")
-        return {**headers, "X-XSRF-TOKEN": token}
+
+        req_headers = getattr(self._local, "req_headers", None)
+        if req_headers is None:
+            req_headers = self._local.req_headers = dict(self.headers)
+        req_headers["X-XSRF-TOKEN"] = token
+        return req_headers
 
     def authenticate(self, email: str = None, password: str = None) -> None:
         """Authenticate with Rethink BH."""
@@ -84,40 +225,44 @@ class RethinkAuth:
             logger.debug("Already authenticated")
             return
 
-        if not email or not password:
-            email, password = self.get_credentials()
-
-        logger.info("Authenticating with Rethink BH")
-
-        try:
-            # Authentication flow
-            self.session.get(f"{self.base_url}/HealthCare", headers=self.headers).raise_for_status()
-
-            self.session.post(
-                f"{self.base_url}/HealthCare/SingleSignOn/GetAuthenticationDetail",
-                json={"User": email},
-                headers=self._with_token(self.headers)
-            ).raise_for_status()
-
-            self.session.post(
-                f"{self.base_url}/HealthCare/User/Login",
-                json={"User": email, "Password": password, "setPermissions": True},
-                headers=self._with_token(self.headers)
-            ).raise_for_status()
-
-            self.session.get(
-                f"{self.base_url}/core/scheduler/appointments",
-                headers=self._with_token(self.headers)
-            ).raise_for_status()
-
-            self._authenticated = True
-            auth_logger.log_auth_success(email)
-            logger.info("Authentication successful")
-
-        except requests.RequestException as e:
-            auth_logger.log_auth_failure(str(e), email)
-            logger.error(f"Authentication failed: {e}")
-            raise RethinkAuthError(f"Authentication failed: {e}")
+        with self._auth_lock:
+            # Another thread may have finished logging in while we waited
+            if self._authenticated:
+                return
+
+            if not email or not password:
+                email, password = self.get_credentials()
+
+            logger.info("Authenticating with Rethink BH")
+
+            try:
+                # Authentication flow; the anti-forgery cookie issued by the first page
+                # load is resolved once and reused for every later step
+                authed_headers = None
+                for method, path, build_payload, needs_token in _AUTH_STEPS:
+                    if needs_token and authed_headers is None:
+                        authed_headers = self._with_token()
+
+                    self.session.request(
+                        method,
+                        f"{self.base_url}{path}",
+                        json=build_payload(email, password) if build_payload else None,
+                        headers=authed_headers if needs_token else self.headers
+                    ).raise_for_status()
+
+                # Reset per-session state first; _authenticated is the lock-free fast-path
+                # flag, so it must only turn True once the new session is fully set up
+                self._auth_generation += 1
+                self._context_established.clear()
+                self._invalidate_xsrf_token()
+                self._authenticated = True
+                auth_logger.log_auth_success(email)
+                logger.info("Authentication successful")
+
+            except requests.RequestException as e:
+                auth_logger.log_auth_failure(str(e), email)
+                logger.error(f"Authentication failed: {e}")
+                raise RethinkAuthError(f"Authentication failed: {e}")
 
     def get_api_headers(self, request_type: str = "dashboard") -> Dict[str, str]:
         """Get headers with fresh tokens for API requests."""
@@ -125,109 +270,156 @@ class RethinkAuth:
             raise RethinkAuthError("Must authenticate first")
 
         # Get XSRF token from session
-        xsrf_headers = self._with_token(self.headers)
-        xsrf_token = xsrf_headers.get("X-XSRF-TOKEN", "")
+        xsrf_token = self._fetch_token()
+        if not xsrf_token:
+            raise RethinkAuthError("No anti-forgery token found in cookies")
 
         if request_type == "dashboard":
             # Dashboard requests need MVC token
-            mvc_token = self._get_mvc_token(xsrf_headers)
-            return {
-                "Accept": "application/json, text/plain, */*",
-                "Content-Type": "application/json;charset=utf-8",
-                "Origin": self.base_url,
-                "Referer": f"{self.base_url}/Healthcare",
-                "User-Agent": self.headers["User-Agent"],
-                "X-Application-Key": self.headers["X-Application-Key"],
-                "X-Origin": self.headers["X-Origin"],
-                "X-XSRF-TOKEN": xsrf_token,
-                "X-XSRF-MVC-TOKEN": mvc_token
-            }
+            mvc_token = self._get_mvc_token(xsrf_token)
+            headers = self._dashboard_tmpl.copy()
+            headers["X-XSRF-TOKEN"] = xsrf_token
+            headers["X-XSRF-MVC-TOKEN"] = mvc_token
+            return headers
         else:
             # Appointment/scheduler requests use simpler headers
-            return {
-                "Accept": "application/json, text/plain, */*",
-                "Content-Type": "application/json;charset=utf-8",
-                "User-Agent": self.headers["User-Agent"],
-                "X-Application-Key": self.headers["X-Application-Key"],
-                "X-Origin": self.headers["X-Origin"],
-                "X-XSRF-TOKEN": xsrf_token
-            }
-
-    def _get_mvc_token(self, headers: Dict[str, str]) -> str:
-        """Extract MVC token from dashboard page."""
-        try:
-            response = self.session.get(f"{self.base_url}/Healthcare/ReportingDashboard", headers=headers)
-            if response.status_code != 200:
-                logger.warning(f"Failed to get dashboard page: {response.status_code}")
-                return headers.get("X-XSRF-TOKEN", "")
-
-            # Extract token from HTML
-            patterns = [
-                r'name="__RequestVerificationToken"[^>]*value="([^"]+)"',
-                r'"__RequestVerificationToken":"([^"]+)"'
-            ]
-
-            for pattern in patterns:
-                match = re.search(pattern, response.text)
-                if match:
-                    token = match.group(1)
-                    logger.debug("Retrieved MVC token")
-                    return token
-
-            logger.warning("MVC token not found, using XSRF token")
-            return headers.get("X-XSRF-TOKEN", "")
-
-        except Exception as e:
-            logger.warning(f"Error getting MVC token: {e}")
-            return headers.get("X-XSRF-TOKEN", "")
+            headers = self._scheduler_tmpl.copy()
+            headers["X-XSRF-TOKEN"] = xsrf_token
+            return headers
+
+    def invalidate_mvc_token(self) -> None:
+        """Drop the cached MVC token so the next dashboard request refetches it."""
+        self._mvc_token = None
+        self._mvc_token_ts = 0.0
+
+    def _get_mvc_token(self, xsrf_token: str) -> str:
+        """Extract MVC token from dashboard page, reusing the cached token while fresh."""
+        if self._mvc_token and time.monotonic() - self._mvc_token_ts < config.RETHINK_MVC_TOKEN_TTL:
+            return self._mvc_token
+
+        with self._auth_lock:
+            if self._mvc_token and time.monotonic() - self._mvc_token_ts < config.RETHINK_MVC_TOKEN_TTL:
+                return self._mvc_token
+
+            # Static browser headers come from the session; only the token is per request
+            headers = {"X-XSRF-TOKEN": xsrf_token}
+            try:
+                # Stream the page and stop reading as soon as the token shows up
+                response = self.session.get(
+                    f"{self.base_url}/Healthcare/ReportingDashboard",
+                    headers=headers,
+                    stream=True
+                )
+                try:
+                    if response.status_code != 200:
+                        logger.warning(f"Failed to get dashboard page: {response.status_code}")
+                        return xsrf_token
+
+                    response.encoding = response.encoding or "utf-8"
+                    buf = ""
+                    for chunk in response.iter_content(chunk_size=8192, decode_unicode=True):
+                        # Rescan a little of the previous data in case a match straddles chunks
+                        scan_from = max(0, len(buf) - 512 - len(_MVC_TOKEN_MARKER))
+                        buf += chunk
+                        token = _find_mvc_token(buf, scan_from)
+                        if token:
+                            self._mvc_token = token
+                            self._mvc_token_ts = time.monotonic()
+                            logger.debug("Retrieved MVC token")
+                            return token
+                finally:
+                    response.close()
+
+                logger.warning("MVC token not found, using XSRF token")
+                return xsrf_token
+
+            except Exception as e:
+                logger.warning(f"Error getting MVC token: {e}")
+                return xsrf_token
 
     def make_request(self, method: str, url: str, request_type: str = "dashboard", **kwargs) -> requests.Response:
-        """Make authenticated request to Rethink BH API."""
-        if not self._authenticated:
-            self.authenticate()
-
-        # Visit appropriate pages based on request type
-        if request_type == "scheduler":
-            self._visit_scheduler_pages()
-        elif request_type == "dashboard":
-            self._visit_dashboard_pages()
-
-        headers = self.get_api_headers(request_type)
-        if 'headers' in kwargs:
-            headers.update(kwargs['headers'])
-        kwargs['headers'] = headers
-
-        try:
-            response = self.session.request(method, url, **kwargs)
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            logger.error(f"API request failed: {method} {url} - {e}")
-            raise RethinkAuthError(f"API request failed: {e}")
-
-    def _visit_scheduler_pages(self) -> None:
+        """
+        Make authenticated request to Rethink BH API.
+
+        A 401/403 is taken as an expired server-side session: the client logs in
+        again and retries the request once.
+        """
+        extra_headers = kwargs.pop('headers', None)
+
+        for attempt in range(2):
+            if not self._authenticated:
+                self.authenticate()
+            # Under the lock so a login still in progress is never mistaken for the current session
+            with self._auth_lock:
+                generation = self._auth_generation
+
+            # Visit appropriate pages once per session to establish context
+            if request_type not in self._context_established:
+                if request_type == "scheduler" and self._visit_scheduler_pages():
+                    self._context_established.add(request_type)
+                elif request_type == "dashboard" and self._visit_dashboard_pages():
+                    self._context_established.add(request_type)
+
+            headers = self.get_api_headers(request_type)
+            if extra_headers:
+                headers.update(extra_headers)
+
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+                response.raise_for_status()
+                return response
+            except requests.RequestException as e:
+                if e.response is not None and e.response.status_code in (401, 403):
+                    with self._auth_lock:
+                        # Only drop the session this request used; another thread may have renewed it already
+                        if self._auth_generation == generation:
+                            self._authenticated = False
+                            self._invalidate_xsrf_token()
+                            self.invalidate_mvc_token()
+                    if attempt == 0:
+                        logger.warning(f"API request unauthorized, re-authenticating: {method} {url}")
+                        continue
+                logger.error(f"API request failed: {method} {url} - {e}")
+                raise RethinkAuthError(f"API request failed: {e}")
+
+    def _visit_scheduler_pages(self) -> bool:
         """Visit scheduler pages to establish session context."""
         try:
             logger.debug("Visiting scheduler pages")
             self.session.get(
                 f"{self.base_url}/core/scheduler/appointments",
-                headers=self._with_token(self.headers)
+                headers=self._with_token()
             ).raise_for_status()
+            return True
         except Exception as e:
             logger.warning(f"Failed to visit scheduler pages: {e}")
+            return False
 
-    def _visit_dashboard_pages(self) -> None:
+    def _visit_dashboard_pages(self) -> bool:
         """Visit dashboard pages to establish session context."""
         try:
             logger.debug("Visiting dashboard pages")
             self.session.get(
                 f"{self.base_url}/Healthcare",
-                headers=self._with_token(self.headers)
+                headers=self._with_token()
             ).raise_for_status()
+            return True
         except Exception as e:
             logger.warning(f"Failed to visit dashboard pages: {e}")
+            return False
 
     @property
     def is_authenticated(self) -> bool:
         """Check if currently authenticated."""
         return self._authenticated
+
+    def close(self) -> None:
+        """Close the HTTP session and release its pooled connections."""
+        self.session.close()
+        self._authenticated = False
+
+    def __enter__(self) -> "RethinkAuth":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,26 +1,156 @@
-import logging
-import json
+import csv
+import io
 import os
 import re
+import threading
 import time
-import uuid
 import datetime
-import psycopg2
-from typing import Dict, List, Optional, Any, Tuple
-from dateutil.parser import parse as parse_date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+import orjson
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Iterable, Iterator
 from urllib.parse import urlparse
 
 from auth import RethinkAuth, RethinkAuthError
+from config import config, db_config
 from logger import get_logger, get_sync_logger, log_performance
 
+if TYPE_CHECKING:
+    from psycopg2.pool import ThreadedConnectionPool
+
 # Initialize logging
 logger = get_logger(__name__)
 sync_logger = get_sync_logger(logger)
 
+# Target columns in the cancelled appointments table, in insertion order ('id' is auto-incrementing)
+_INSERT_COLUMNS = (
+    'client_id', 'client_name', 'staff_id', 'staff_name',
+    'staff_title', 'start_date', 'start_time', 'end_time',
+    'status_id', 'status_name', 'cancellation_type_id',
+    'cancellation_note', 'location_name', 'service_name',
+    'provider_service_name', 'funder_name', 'date_created',
+    'date_last_modified', 'modified_by', 'hours', 'minutes',
+    'appointmentid',  # Store the original ID as appointmentid
+    'series_appointment_id', 'parent_verification', 'paycode_name',
+    'appointment_tag', 'validation', 'appointment_type',
+    'cancellation_type_name', 'duration'
+)
+
+# Appointment fields copied verbatim from the API "appt" object: (output key, API key)
+_APPT_FIELDS = (
+    ('id', 'id'),
+    ('client_id', 'clientId'),
+    ('staff_id', 'staffId'),
+    ('staff_name', 'staffName'),
+    ('staff_title', 'staffTitle'),
+    ('start_date', 'startDate'),
+    ('status_id', 'statusId'),
+    ('status_name', 'statusName'),
+    ('cancellation_type_id', 'cancellationTypeId'),
+    ('cancellation_note', 'cancellationNote'),
+    ('cancellation_type_name', 'cancellationTypeName'),
+    ('location_name', 'locationName'),
+    ('service_name', 'serviceName'),
+    ('provider_service_name', 'providerServiceName'),
+    ('funder_name', 'funderName'),
+    ('date_created', 'dateCreated'),
+    ('date_last_modified', 'dateLastModified'),
+    ('modified_by', 'modifiedBy'),
+    ('series_appointment_id', 'seriesAppointmentId'),
+    ('parent_verification', 'isParentVerificationRequired'),
+    ('paycode_name', 'paycodeName'),
+    ('appointment_tag', 'activityTagName'),
+    ('appointment_type', 'appointmentTypeName'),
+)
+
+# Date format the scheduler API expects, taken from the sample browser request
+_API_DATE_FORMAT = "%m/%d/%Y, %I:%M:%S %p"
+
+# Bytes requested per read() while streaming COPY data (psycopg2 defaults to 8 KB)
+_COPY_CHUNK_SIZE = 64 * 1024
+
+# "HH:MM" for every minute of the day, indexed by minutes since midnight
+_MIN2TIME = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in range(60))
+
 class CancelledAppointmentsError(Exception):
     """Custom exception for cancelled appointments operations."""
     pass
 
+# Process-wide connection pool, created on first use
+_POOL: Optional["ThreadedConnectionPool"] = None
+_POOL_URL: Optional[str] = None  # The database URL _POOL connects to
+_POOL_LOCK = threading.Lock()
+# Callers wait here for a free connection instead of getting PoolError from an exhausted pool
+_POOL_SLOTS = threading.BoundedSemaphore(db_config.POOL_MAX_CONN)
+
+def _get_pool(db_url: str) -> "ThreadedConnectionPool":
+    """Return the shared database connection pool, creating it from db_url on first call."""
+    global _POOL, _POOL_URL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                # Imported lazily: fetch-only callers never load libpq/SSL
+                from psycopg2.pool import ThreadedConnectionPool
+                parsed = urlparse(db_url)
+                _POOL = ThreadedConnectionPool(
+                    db_config.POOL_MIN_CONN,
+                    db_config.POOL_MAX_CONN,
+                    dbname=parsed.path[1:],  # Remove leading slash
+                    user=parsed.username,
+                    password=parsed.password,
+                    host=parsed.hostname,
+                    port=parsed.port
+                )
+                _POOL_URL = db_url
+                logger.info(f"Created database connection pool (max {db_config.POOL_MAX_CONN})")
+    if db_url != _POOL_URL:
+        # One pool per process; silently reusing it would write to the wrong database
+        raise CancelledAppointmentsError("Database URL differs from the one the connection pool was created for")
+    return _POOL
+
+def close_pool() -> None:
+    """Close every pooled database connection; called at application shutdown."""
+    global _POOL, _POOL_URL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
+            _POOL_URL = None
+            logger.info("Closed database connection pool")
+
+class _CopyRowReader:
+    """
+    File-like adapter that feeds COPY ... FROM STDIN from an iterator of rows.
+
+    Rows are pulled and CSV-encoded only when psycopg2 asks for more data,
+    so the full result set is never held in memory. An unquoted empty field is NULL.
+    """
+
+    def __init__(self, rows: Iterator[list]):
+        self._rows = rows
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, quoting=csv.QUOTE_NOTNULL, lineterminator='\n')
+        self.row_count = 0
+
+    def read(self, size: int = -1) -> str:
+        buf = self._buf
+        while size < 0 or buf.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self.row_count += 1
+
+        data = buf.getvalue()
+        if 0 <= size < len(data):
+            data, rest = data[:size], data[size:]
+        else:
+            rest = ''
+        buf.seek(0)
+        buf.truncate()
+        buf.write(rest)
+        return data
+
 class CancelledAppointmentsFetcher:
     """
     Class to fetch cancelled appointments from Rethink BH using the paginated API.
@@ -29,13 +159,16 @@ class CancelledAppointmentsFetcher:
     Also handles inserting the data into a specified database table.
     """
     
-    def __init__(self, auth: Optional[RethinkAuth], table_name: str):
+    def __init__(self, auth: Optional[RethinkAuth], table_name: str, drop_indexes_during_load: Optional[bool] = None):
         """
         Initialize the CancelledAppointmentsFetcher with auth instance and table name.
         
         Args:
             auth: RethinkAuth instance. Required for API authentication.
             table_name: Name of the database table to insert data into. Required parameter.
+            drop_indexes_during_load: On truncating syncs, drop secondary indexes before the
+                load and rebuild them afterwards in the same transaction. Defaults to
+                db_config.DROP_INDEXES_DURING_LOAD.
             
         Raises:
             CancelledAppointmentsError: If table_name is not provided or invalid.
@@ -55,26 +188,32 @@ class CancelledAppointmentsFetcher:
         self.auth = auth
         self.page_size = 100  # Default page size as observed in the web UI
         self.table_name = table_name
+        self._table_verified = False  # Set once the table is known to exist
+        if drop_indexes_during_load is None:
+            drop_indexes_during_load = db_config.DROP_INDEXES_DURING_LOAD
+        self.drop_indexes_during_load = drop_indexes_during_load
+        self._dropped_index_ddl: List[str] = []  # CREATE INDEX statements to replay after the load
+        self._staging_table = f"{table_name}_staging"  # Session-local temp table, dropped at commit
         logger.debug(f"Initialized CancelledAppointmentsFetcher with table_name='{table_name}'")
 
     
-    def _prepare_request_payload(self, from_date: datetime.datetime, 
-                               to_date: datetime.datetime, 
-                               skip: int = 0) -> Dict[str, Any]:
+    def _build_base_payload(self, from_date: datetime.datetime, 
+                            to_date: datetime.datetime) -> Dict[str, Any]:
         """
-        Prepare the request payload for the GetEventsListNewAsync endpoint.
+        Build the request payload for the GetEventsListNewAsync endpoint.
+
+        The payload is built once per fetch; each page only overrides "skip".
         
         Args:
             from_date: Start date for appointment search
             to_date: End date for appointment search
-            skip: Number of records to skip (for pagination)
             
         Returns:
-            Dict containing the request payload
+            Dict containing the request payload with skip=0
         """
-        # Format dates as expected by the API - using the format from the sample browser request
-        from_date_str = from_date.strftime("%m/%d/%Y, %I:%M:%S %p")
-        to_date_str = to_date.strftime("%m/%d/%Y, %I:%M:%S %p")
+        # Format dates as expected by the API; formatted once per fetch, shared by every page
+        from_date_str = from_date.strftime(_API_DATE_FORMAT)
+        to_date_str = to_date.strftime(_API_DATE_FORMAT)
         
         # Build payload based on the sample browser request structure
         payload = {
@@ -87,7 +226,7 @@ class CancelledAppointmentsFetcher:
             "staffIds": [],
             "timeFormat": "hh:mm tt",
             "dateFormat": "MM/dd/yyyy",
-            "skip": skip,
+            "skip": 0,
             "pageSize": self.page_size,
             "includeAssignedOnly": False,
             "sorting": {
@@ -138,17 +277,68 @@ class CancelledAppointmentsFetcher:
         
         return payload
     
-    def fetch_cancelled_appointments(self, from_date: datetime.datetime, 
-                                    to_date: datetime.datetime) -> List[Dict[str, Any]]:
+    def _fetch_one_page(self, base_payload: Dict[str, Any], skip: int) -> List[Dict[str, Any]]:
         """
-        Fetch all cancelled appointments within the given date range.
+        Fetch a single page of cancelled appointments.
+
+        Args:
+            base_payload: Payload from _build_base_payload (not modified)
+            skip: Number of records to skip (for pagination)
+
+        Returns:
+            List of raw appointment objects on this page
+        """
+        logger.debug(f"Fetching page with skip={skip}, page_size={self.page_size}")
+
+        # Shallow copy so concurrent pages never share the mutable "skip" slot
+        payload = {**base_payload, "skip": skip}
+
+        # Make the request using the scheduler request type
+        api_path = "/core/api/scheduling/scheduling/GetEventsListNewAsync"
+        full_url = f"{self.auth.base_url}{api_path}"
+
+        # Serialized with orjson; the scheduler header template already sets Content-Type: application/json
+        response = self.auth.make_request(
+            "POST",
+            full_url,
+            data=orjson.dumps(payload),
+            request_type="scheduler"
+        )
+
+        # Check if request was successful
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch cancelled appointments: {response.status_code} {response.text}")
+            raise Exception(f"Failed to fetch cancelled appointments: {response.status_code}")
+
+        # Parse response
+        data = orjson.loads(response.content)
+
+        # Extract appointments from the response
+        appointments = data.get("events", [])
+        logger.info(f"Fetched {len(appointments)} cancelled appointments (skip={skip})")
+        return appointments
+
+    def _fetch_processed_page(self, base_payload: Dict[str, Any], skip: int) -> List[Dict[str, Any]]:
+        """Fetch a page and project it to processed records in the worker, so the raw events are freed at once."""
+        return self.process_appointments(self._fetch_one_page(base_payload, skip))
+
+    def iter_cancelled_appointments(self, from_date: datetime.datetime,
+                                    to_date: datetime.datetime,
+                                    processed: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield pages of cancelled appointments within the given date range, in order.
+
+        The first page is fetched on its own; if it is full, further pages are
+        requested concurrently in windows of FETCH_MAX_WORKERS until a short page
+        marks the end of the result set. Each window is yielded as soon as it completes.
         
         Args:
             from_date: Start date for appointment search
             to_date: End date for appointment search
+            processed: Yield processed records instead of raw API objects
             
-        Returns:
-            List of cancelled appointment objects
+        Yields:
+            Lists of cancelled appointment objects, one per page
         """
         logger.info(f"Fetching cancelled appointments from {from_date} to {to_date}")
         
@@ -156,48 +346,48 @@ class CancelledAppointmentsFetcher:
         if not self.auth.is_authenticated:
             self.auth.authenticate()
         
-        all_appointments = []
-        skip = 0
-        has_more = True
+        base_payload = self._build_base_payload(from_date, to_date)
+        fetch_page = self._fetch_processed_page if processed else self._fetch_one_page
+        first_page = fetch_page(base_payload, 0)
+        yield first_page
+        if len(first_page) < self.page_size:
+            return
+
+        workers = max(1, config.FETCH_MAX_WORKERS)
+        next_skip = self.page_size
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # Speculatively request the next window of pages
+                skips = [next_skip + i * self.page_size for i in range(workers)]
+                futures = {
+                    executor.submit(fetch_page, base_payload, skip): skip
+                    for skip in skips
+                }
+                pages = {}
+                for future in as_completed(futures):
+                    pages[futures[future]] = future.result()
+
+                # Yield in page order, stopping at the first short page
+                for skip in skips:
+                    yield pages[skip]
+                    if len(pages[skip]) < self.page_size:
+                        return
+                next_skip = skips[-1] + self.page_size
+
+    def fetch_cancelled_appointments(self, from_date: datetime.datetime, 
+                                    to_date: datetime.datetime) -> List[Dict[str, Any]]:
+        """
+        Fetch all cancelled appointments within the given date range.
         
-        # Handle pagination by fetching until no more results
-        while has_more:
-            logger.debug(f"Fetching page with skip={skip}, page_size={self.page_size}")
-            
-            payload = self._prepare_request_payload(from_date, to_date, skip)
-            
-            # Make the request using the scheduler request type
-            api_path = "/core/api/scheduling/scheduling/GetEventsListNewAsync"
-            full_url = f"{self.auth.base_url}{api_path}"
-            
-            response = self.auth.make_request(
-                "POST",
-                full_url,
-                json=payload,
-                request_type="scheduler"
-            )
-            
-            # Check if request was successful
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch cancelled appointments: {response.status_code} {response.text}")
-                raise Exception(f"Failed to fetch cancelled appointments: {response.status_code}")
-            
-            # Parse response
-            data = response.json()
-            
-            # Extract appointments from the response
-            appointments = data.get("events", [])
-            logger.info(f"Fetched {len(appointments)} cancelled appointments")
-            
-            # Add to our collection
-            all_appointments.extend(appointments)
+        Args:
+            from_date: Start date for appointment search
+            to_date: End date for appointment search
             
-            # Check if we need to fetch more pages
-            if len(appointments) < self.page_size:
-                has_more = False
-            else:
-                skip += self.page_size
-        
+        Returns:
+            List of cancelled appointment objects
+        """
+        all_appointments = list(chain.from_iterable(self.iter_cancelled_appointments(from_date, to_date)))
         logger.info(f"Total cancelled appointments fetched: {len(all_appointments)}")
         return all_appointments
     
@@ -281,50 +471,34 @@ class CancelledAppointmentsFetcher:
             List of processed appointment objects with relevant fields
         """
         processed = []
+        name_code = self._generate_name_code
+        minutes_to_time = self._convert_minutes_to_time
         
         for appointment in appointments:
             # Extract data from the nested structure
-            appt_data = appointment.get("appt", {})
+            appt_data = appointment.get("appt") or {}
             evt_data = appointment.get("evt", {})
+            get = appt_data.get
             
-            # Get the client name and anonymize it
-            client_name = appt_data.get("clientName")
-            anonymized_client_name = self._generate_name_code(client_name) if client_name else None
+            # Fields that need conversion before they are stored
+            client_name, start_time, end_time = get('clientName'), get('startTime'), get('endTime')
             
             # Create a processed record with relevant fields
-            processed_appt = {
-                "id": appt_data.get("id"),
-                "client_id": appt_data.get("clientId"),
-                "client_name": anonymized_client_name,  # Use anonymized client name
-                "staff_id": appt_data.get("staffId"),
-                "staff_name": appt_data.get("staffName"),
-                "staff_title": appt_data.get("staffTitle"),
-                "start_date": appt_data.get("startDate"),
-                "start_time": self._convert_minutes_to_time(appt_data.get("startTime")),
-                "end_time": self._convert_minutes_to_time(appt_data.get("endTime")),
-                "status_id": appt_data.get("statusId"),
-                "status_name": appt_data.get("statusName"),
-                "cancellation_type_id": appt_data.get("cancellationTypeId"),
-                "cancellation_note": appt_data.get("cancellationNote"),
-                "cancellation_type_name": appt_data.get("cancellationTypeName"),
-                "location_name": appt_data.get("locationName"),
-                "service_name": appt_data.get("serviceName"),
-                "provider_service_name": appt_data.get("providerServiceName"),
-                "funder_name": appt_data.get("funderName"),
-                "date_created": appt_data.get("dateCreated"),
-                "date_last_modified": appt_data.get("dateLastModified"),
-                "modified_by": appt_data.get("modifiedBy"),
-                "hours": evt_data.get("hours", 0),
-                "minutes": evt_data.get("minutes", 0),
-                # Additional fields for cancelledAppointments schema
-                "series_appointment_id": appt_data.get("seriesAppointmentId"),
-                "parent_verification": appt_data.get("isParentVerificationRequired"),
-                "paycode_name": appt_data.get("paycodeName"),
-                "appointment_tag": appt_data.get("activityTagName"),
-                "validation": evt_data.get("validation"),
-                "appointment_type": appt_data.get("appointmentTypeName"),
-                "duration": float(evt_data.get("hours", 0)) + (float(evt_data.get("minutes", 0)) / 60) if (evt_data.get("hours") is not None or evt_data.get("minutes") is not None) else None
-            }
+            processed_appt = {out: get(src) for out, src in _APPT_FIELDS}
+            processed_appt["client_name"] = name_code(client_name) if client_name else None  # Use anonymized client name
+            processed_appt["start_time"] = minutes_to_time(start_time)
+            processed_appt["end_time"] = minutes_to_time(end_time)
+            
+            hours = evt_data.get("hours", 0)
+            minutes = evt_data.get("minutes", 0)
+            processed_appt["hours"] = hours
+            processed_appt["minutes"] = minutes
+            processed_appt["validation"] = evt_data.get("validation")
+            processed_appt["duration"] = (
+                float(hours) + float(minutes) / 60
+                if (evt_data.get("hours") is not None or evt_data.get("minutes") is not None)
+                else None
+            )
             
             processed.append(processed_appt)
         
@@ -342,6 +516,8 @@ class CancelledAppointmentsFetcher:
         """
         if minutes is None:
             return None
+        if 0 <= minutes < 1440:
+            return _MIN2TIME[minutes]
             
         hours, mins = divmod(minutes, 60)
         return f"{hours:02d}:{mins:02d}"
@@ -362,6 +538,30 @@ class CancelledAppointmentsFetcher:
         """
         logger.info("Starting cancelled appointments fetch", from_date=from_date_str, to_date=to_date_str)
         
+        from_date, to_date = self._parse_date_range(from_date_str, to_date_str)
+        processed_appointments = list(chain.from_iterable(self._iter_pages(from_date, to_date)))
+        
+        logger.info("Completed cancelled appointments fetch", 
+                   count=len(processed_appointments), 
+                   from_date=from_date_str, 
+                   to_date=to_date_str)
+                   
+        return processed_appointments
+    
+    def _parse_date_range(self, from_date_str: str, to_date_str: str) -> tuple[datetime.datetime, datetime.datetime]:
+        """
+        Validate the date strings and expand them to a full-day datetime range.
+        
+        Args:
+            from_date_str: Start date string in ISO format (YYYY-MM-DD)
+            to_date_str: End date string in ISO format (YYYY-MM-DD)
+            
+        Returns:
+            Tuple of (start of from_date, end of to_date)
+            
+        Raises:
+            CancelledAppointmentsError: If date parameters are missing or invalid
+        """
         # Validate required parameters
         if not from_date_str:
             error_msg = "Missing required parameter: from_date_str must be provided in YYYY-MM-DD format"
@@ -375,14 +575,14 @@ class CancelledAppointmentsFetcher:
         
         # Parse date strings to datetime objects
         try:
-            from_date = parse_date(from_date_str).replace(hour=0, minute=0, second=0, microsecond=0)
+            from_date = datetime.datetime.fromisoformat(from_date_str).replace(hour=0, minute=0, second=0, microsecond=0)
         except Exception as e:
             error_msg = f"Invalid from_date format: '{from_date_str}'. Expected YYYY-MM-DD format. Error: {str(e)}"
             logger.error(error_msg)
             raise CancelledAppointmentsError(error_msg)
             
         try:
-            to_date = parse_date(to_date_str).replace(hour=23, minute=59, second=59, microsecond=999999)
+            to_date = datetime.datetime.fromisoformat(to_date_str).replace(hour=23, minute=59, second=59, microsecond=999999)
         except Exception as e:
             error_msg = f"Invalid to_date format: '{to_date_str}'. Expected YYYY-MM-DD format. Error: {str(e)}"
             logger.error(error_msg)
@@ -395,23 +595,28 @@ class CancelledAppointmentsFetcher:
             logger.error(error_msg)
             raise CancelledAppointmentsError(error_msg)
             
+        return from_date, to_date
+    
+    def _iter_pages(self, from_date: datetime.datetime, to_date: datetime.datetime) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield processed appointment pages for the date range, splitting it into 90-day batches when needed.
+        
+        Args:
+            from_date: Start date
+            to_date: End date
+            
+        Yields:
+            Lists of processed appointment objects, one per page
+        """
+        date_diff = (to_date - from_date).days
         if date_diff > 90:
             logger.warning("Date range exceeds 90 days, which is the API limit. Splitting into batches.", 
-                          date_diff=date_diff, from_date=from_date_str, to_date=to_date_str)
-            return self._fetch_in_batches(from_date, to_date)
-        
-        # Fetch and process appointments
-        raw_appointments = self.fetch_cancelled_appointments(from_date, to_date)
-        processed_appointments = self.process_appointments(raw_appointments)
-        
-        logger.info("Completed cancelled appointments fetch", 
-                   count=len(processed_appointments), 
-                   from_date=from_date_str, 
-                   to_date=to_date_str)
-                   
-        return processed_appointments
+                          date_diff=date_diff, from_date=from_date.date().isoformat(), to_date=to_date.date().isoformat())
+            yield from self._iter_in_batches(from_date, to_date)
+        else:
+            yield from self.iter_cancelled_appointments(from_date, to_date, processed=True)
     
-    def _fetch_in_batches(self, from_date: datetime.datetime, to_date: datetime.datetime) -> List[Dict[str, Any]]:
+    def _iter_in_batches(self, from_date: datetime.datetime, to_date: datetime.datetime) -> Iterator[List[Dict[str, Any]]]:
         """
         Fetch appointments in 90-day batches to handle API limitations.
         
@@ -419,10 +624,9 @@ class CancelledAppointmentsFetcher:
             from_date: Start date
             to_date: End date
             
-        Returns:
-            Combined list of processed appointments from all batches
+        Yields:
+            Lists of processed appointment objects, one per page, across all batches
         """
-        all_appointments = []
         current_from = from_date
         
         while current_from < to_date:
@@ -431,18 +635,11 @@ class CancelledAppointmentsFetcher:
             
             logger.info(f"Fetching batch from {current_from} to {batch_end}")
             
-            # Fetch this batch
-            raw_batch = self.fetch_cancelled_appointments(current_from, batch_end)
-            processed_batch = self.process_appointments(raw_batch)
-            
-            # Add to results
-            all_appointments.extend(processed_batch)
+            yield from self.iter_cancelled_appointments(current_from, batch_end, processed=True)
             
             # Move to next batch
             current_from = batch_end + datetime.timedelta(days=1)
         
-        return all_appointments
-        
     def _get_database_url(self) -> str:
         """Get database URL from environment or Secret Manager."""
         db_url = os.getenv("SUPABASE_DB_URL")
@@ -461,45 +658,86 @@ class CancelledAppointmentsFetcher:
 
         raise CancelledAppointmentsError("Missing database URL")
 
+    @staticmethod
+    def _is_connection_alive(conn) -> bool:
+        """Round-trip a trivial query; a pooled connection can be dropped server-side while idle."""
+        import psycopg2
+
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
     def _connect_database(self, db_url: str):
-        """Connect to Supabase PostgreSQL database."""
+        """Check out a connection to the Supabase PostgreSQL database from the pool."""
+        _POOL_SLOTS.acquire()
         try:
-            parsed = urlparse(db_url)
-            conn = psycopg2.connect(
-                dbname=parsed.path[1:],  # Remove leading slash
-                user=parsed.username,
-                password=parsed.password,
-                host=parsed.hostname,
-                port=parsed.port
-            )
+            pool = _get_pool(db_url)
+            conn = pool.getconn()
+            if not self._is_connection_alive(conn):
+                # Dropped since it was returned; replace it with a fresh one
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
             logger.info("Connected to Supabase database")
             return conn
         except Exception as e:
+            _POOL_SLOTS.release()
             logger.error("Database connection failed")
             raise CancelledAppointmentsError(f"Database connection failed: {str(e)}")
+
+    def _release_connection(self, conn) -> None:
+        """Return a connection to the pool, discarding it if it is no longer usable."""
+        import psycopg2
+
+        try:
+            if _POOL is None:
+                conn.close()
+                return
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()  # Never hand out a connection mid-transaction
+                except psycopg2.Error:
+                    broken = True
+            _POOL.putconn(conn, close=broken)
+        finally:
+            _POOL_SLOTS.release()
             
     def _truncate_table(self, conn) -> None:
-        """Truncate the specified table and reset ID sequence."""
+        """Truncate the specified table and reset ID sequence (uncommitted)."""
+        from psycopg2 import errors
+
+        self._dropped_index_ddl = []  # Never replay DDL left over from an earlier failed sync
         try:
             with conn.cursor() as cur:
-                # First check if the table exists (case-insensitive)
-                cur.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_schema = 'public' 
-                        AND lower(table_name) = lower(%s)
-                    )
-                """, (self.table_name,))
-                table_exists = cur.fetchone()[0]
-                
-                if not table_exists:
-                    logger.error(f"Table '{self.table_name}' does not exist in the database")
-                    raise CancelledAppointmentsError(f"Table '{self.table_name}' does not exist in the database. Please create the table first or check the table name.")
+                # First check if the table exists (case-insensitive); only needed once per fetcher
+                if not self._table_verified:
+                    cur.execute("""
+                        SELECT EXISTS (
+                            SELECT FROM information_schema.tables 
+                            WHERE table_schema = 'public' 
+                            AND lower(table_name) = lower(%s)
+                        )
+                    """, (self.table_name,))
+                    table_exists = cur.fetchone()[0]
+                    
+                    if not table_exists:
+                        logger.error(f"Table '{self.table_name}' does not exist in the database")
+                        raise CancelledAppointmentsError(f"Table '{self.table_name}' does not exist in the database. Please create the table first or check the table name.")
 
                 # Truncate the table
                 cur.execute(f'TRUNCATE TABLE "{self.table_name}" CASCADE')
+                self._table_verified = True
                 logger.info(f"Table '{self.table_name}' truncated")
 
+                if self.drop_indexes_during_load:
+                    self._drop_secondary_indexes(cur)
+
                 # Try resetting the serial sequence (only if one exists)
                 cur.execute(f"""
                     SELECT pg_get_serial_sequence('"{self.table_name}"', 'id')
@@ -513,33 +751,40 @@ class CancelledAppointmentsFetcher:
                 else:
                     logger.warning(f"No serial sequence found for 'id' in table '{self.table_name}'")
 
-                conn.commit()
-        except psycopg2.errors.UndefinedTable as e:
+                # Committed together with the staged load in _insert_data, so a failed sync leaves the old rows in place
+        except errors.UndefinedTable as e:
             logger.error(f"Table '{self.table_name}' does not exist")
             raise CancelledAppointmentsError(f"Table '{self.table_name}' does not exist in the database. Please create the table first or check the table name.")
         except Exception as e:
             logger.error(f"Table truncation failed: {str(e)}")
             raise CancelledAppointmentsError(f"Table truncation failed: {str(e)}")
             
+    def _drop_secondary_indexes(self, cur) -> None:
+        """
+        Drop indexes not backing a constraint and remember their definitions.
+
+        Runs inside the load transaction, so a failed sync rolls the drop back too.
+        """
+        cur.execute("""
+            SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = %s::regclass
+              AND NOT i.indisprimary
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        """, (f'"{self.table_name}"',))
+        indexes = cur.fetchall()
+
+        for index_name, index_ddl in indexes:
+            cur.execute(f"DROP INDEX {index_name}")
+        self._dropped_index_ddl = [index_ddl for _, index_ddl in indexes]
+
+        if indexes:
+            logger.info(f"Dropped {len(indexes)} secondary indexes on '{self.table_name}' for bulk load")
+
     def _prepare_row_data(self, appointment: Dict[str, Any]) -> list:
         """Prepare a single appointment record for database insertion."""
-        # Define the columns in the order they should be inserted
-        # Adjusted columns based on cancelledAppointments schema
-        db_columns = [
-            'client_id', 'client_name', 'staff_id', 'staff_name',
-            'staff_title', 'start_date', 'start_time', 'end_time',
-            'status_id', 'status_name', 'cancellation_type_id',
-            'cancellation_note', 'location_name', 'service_name',
-            'provider_service_name', 'funder_name', 'date_created',
-            'date_last_modified', 'modified_by', 'hours', 'minutes',
-            'appointmentid',  # Store the original ID as appointmentid
-            'series_appointment_id', 'parent_verification', 'paycode_name',
-            'appointment_tag', 'validation', 'appointment_type',
-            'cancellation_type_name', 'duration'
-        ]
-        
         values = []
-        for col in db_columns:
+        for col in _INSERT_COLUMNS:
             if col == 'appointmentid':
                 # Store the original ID in the appointmentid field
                 values.append(appointment.get('id'))
@@ -553,76 +798,87 @@ class CancelledAppointmentsFetcher:
             
         return values
         
-    def _insert_data(self, conn, appointments: List[Dict[str, Any]]) -> tuple[int, int]:
-        """Insert appointment data into database using batch operations."""
-        logger.info("Starting data insertion")
+    def _stage_data(self, conn, appointments: Iterable[Dict[str, Any]]) -> tuple[int, int]:
+        """
+        Stream appointment data into a temporary staging table with a single COPY ... FROM STDIN.
+
+        The API pages are still being fetched while this runs, so only the staging table
+        is written; the target is just read for its column types. The staging table is a
+        plain table, so COPY works whatever the target is (views with rules included),
+        and it is dropped when the load transaction ends.
+        """
+        from psycopg2 import errors, sql
 
-        success_count = 0
         error_count = 0
 
-        # Prepare all rows for batch insertion
-        all_values = []
-        for i, appointment in enumerate(appointments):
-            try:
-                values = self._prepare_row_data(appointment)
-                all_values.append(values)
-            except Exception as e:
-                error_count += 1
-                logger.warning(f"Error preparing appointment record {i + 1}: {e}")
+        def prepared_rows() -> Iterator[list]:
+            nonlocal error_count
+            for i, appointment in enumerate(appointments):
+                try:
+                    values = self._prepare_row_data(appointment)
+                except Exception as e:
+                    error_count += 1
+                    logger.warning(f"Error preparing appointment record {i + 1}: {e}")
+                    continue
+                yield values
 
-        # Batch size for insertion
-        batch_size = 50  # Smaller batch size for complex data
+        reader = _CopyRowReader(prepared_rows())
+        params = {
+            "table": sql.Identifier(self.table_name),
+            "staging": sql.Identifier(self._staging_table),
+            "columns": sql.SQL(', ').join(map(sql.Identifier, _INSERT_COLUMNS)),
+        }
 
         try:
             with conn.cursor() as cur:
-                for i in range(0, len(all_values), batch_size):
-                    batch = all_values[i:i+batch_size]
-                    
-                    if not batch:  # Skip empty batches
-                        continue
+                cur.execute(sql.SQL(
+                    "CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA"
+                ).format(**params))
+                cur.copy_expert(
+                    sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT CSV)").format(**params),
+                    reader, size=_COPY_CHUNK_SIZE
+                )
+        except errors.UndefinedTable:
+            logger.error(f"Table '{self.table_name}' does not exist")
+            raise CancelledAppointmentsError(f"Table '{self.table_name}' does not exist in the database. Please create the table first or check the table name.")
+        except Exception as e:
+            logger.error(f"Data staging failed: {e}")
+            raise CancelledAppointmentsError(f"Data insertion failed: {e}")
 
-                    # Count the number of values in each row to create the correct number of placeholders
-                    num_values = len(batch[0])
-                    placeholders = ','.join(['(%s)' % ','.join(['%s'] * num_values)] * len(batch))
-                    
-                    # Flatten the batch values for the execute call
-                    flattened_values = [item for sublist in batch for item in sublist]
-
-                    # Define the columns based on the database table structure - without 'id' as it's auto-incrementing
-                    # Updated columns to match cancelledAppointments schema
-                    columns = [
-                        'client_id', 'client_name', 'staff_id', 'staff_name',
-                        'staff_title', 'start_date', 'start_time', 'end_time',
-                        'status_id', 'status_name', 'cancellation_type_id',
-                        'cancellation_note', 'location_name', 'service_name',
-                        'provider_service_name', 'funder_name', 'date_created',
-                        'date_last_modified', 'modified_by', 'hours', 'minutes',
-                        'appointmentid',  # Store the original ID as appointmentid
-                        'series_appointment_id', 'parent_verification', 'paycode_name',
-                        'appointment_tag', 'validation', 'appointment_type',
-                        'cancellation_type_name', 'duration'
-                    ]
-                    
-                    column_str = '", "'.join(columns)
-                    
-                    query = f"""
-                        INSERT INTO "{self.table_name}" ("{column_str}")
-                        VALUES {placeholders}
-                    """
+        logger.info(f"Staged {reader.row_count} records for '{self.table_name}'")
+        return reader.row_count, error_count
+
+    def _insert_data(self, conn) -> None:
+        """Move the staged rows into the target table and commit together with any truncate."""
+        from psycopg2 import sql
+
+        logger.info("Starting data insertion")
 
-                    cur.execute(query, flattened_values)
-                    success_count += len(batch)
-                    logger.info(f"Inserted batch {i//batch_size + 1}, records {i+1}-{i+len(batch)}")
+        try:
+            with conn.cursor() as cur:
+                # INSERT ... SELECT also works where COPY is refused (e.g. views with rules)
+                columns = sql.SQL(', ').join(map(sql.Identifier, _INSERT_COLUMNS))
+                cur.execute(sql.SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging}").format(
+                    table=sql.Identifier(self.table_name),
+                    staging=sql.Identifier(self._staging_table),
+                    columns=columns
+                ))
 
-                conn.commit()
-                logger.info(f"Data insertion completed: {success_count} success, {error_count} errors")
+                # Rebuild any indexes dropped for the load before committing
+                for index_ddl in self._dropped_index_ddl:
+                    cur.execute(index_ddl)
+                if self._dropped_index_ddl:
+                    logger.info(f"Recreated {len(self._dropped_index_ddl)} indexes on '{self.table_name}'")
+
+            conn.commit()
+            logger.info("Data insertion completed")
 
         except Exception as e:
             conn.rollback()
             logger.error(f"Data insertion failed: {e}")
             raise CancelledAppointmentsError(f"Data insertion failed: {e}")
-        
-        return success_count, error_count
+        finally:
+            self._dropped_index_ddl = []
 
 
     @log_performance
@@ -642,7 +898,7 @@ class CancelledAppointmentsFetcher:
             CancelledAppointmentsError: If parameters are missing or invalid
         """
         # Generate a sync ID for tracking this operation
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Log sync start
         sync_id = sync_logger.log_sync_start("cancelled_appointments", {
@@ -671,9 +927,12 @@ class CancelledAppointmentsFetcher:
                        from_date=from_date_str, 
                        to_date=to_date_str)
                        
-            appointments = self.get_cancelled_appointments(from_date_str, to_date_str)
+            from_date, to_date = self._parse_date_range(from_date_str, to_date_str)
+            appointments = chain.from_iterable(self._iter_pages(from_date, to_date))
             
-            if not appointments:
+            # Peek at the first record so an empty result never touches the table
+            first = next(appointments, None)
+            if first is None:
                 logger.warning("No cancelled appointments found to sync")
                 result = {
                     "status": "success",
@@ -682,40 +941,50 @@ class CancelledAppointmentsFetcher:
                     "records_inserted": 0,
                     "errors": 0,
                     "table_name": self.table_name,
-                    "duration_seconds": round(time.time() - start_time, 2)
+                    "duration_seconds": round(time.perf_counter() - start_time, 2)
                 }
                 sync_logger.log_sync_complete(sync_id, result)
                 return result
             
+            appointments = chain([first], appointments)
+            
             # Connect to database
             logger.info("Connecting to database")
             db_url = self._get_database_url()
             conn = self._connect_database(db_url)
             
-            # Truncate table if requested
-            if truncate:
-                logger.info(f"Truncating table '{self.table_name}'")
-                self._truncate_table(conn)
-                logger.info(f"Table {self.table_name} truncated successfully")
-            else:
-                logger.info(f"Skipping table truncation for '{self.table_name}'")
-            
-            # Insert data
-            logger.info(f"Inserting {len(appointments)} records into '{self.table_name}'")
-            success_count, error_count = self._insert_data(conn, appointments)
-            
-            # Close connection
-            conn.close()
+            try:
+                # Stream the remaining pages into staging; the target table is not locked for writes yet
+                logger.info(f"Streaming records into staging for '{self.table_name}'")
+                success_count, error_count = self._stage_data(conn, appointments)
+                
+                # Truncate and load under one short lock, committed together
+                if truncate:
+                    logger.info(f"Truncating table '{self.table_name}'")
+                    self._truncate_table(conn)
+                    logger.info(f"Table {self.table_name} truncated successfully")
+                else:
+                    logger.info(f"Skipping table truncation for '{self.table_name}'")
+                
+                self._insert_data(conn)
+            except Exception:
+                # Undo the truncate and any index drop; the dropped DDL must not leak into the next sync
+                conn.rollback()
+                self._dropped_index_ddl = []
+                raise
+            finally:
+                # Return connection to the pool
+                self._release_connection(conn)
             
             # Calculate duration
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             
             # Prepare result
             result = {
                 "status": "success",
                 "sync_message": f"Successfully synced {success_count} cancelled appointments to {self.table_name}",
                 "table_name": self.table_name,
-                "records_processed": len(appointments),
+                "records_processed": success_count + error_count,
                 "records_inserted": success_count,
                 "errors": error_count,
                 "duration_seconds": round(duration, 2)
@@ -727,7 +996,7 @@ class CancelledAppointmentsFetcher:
             return result
             
         except Exception as e:
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             error_msg = str(e)
             sync_logger.log_sync_error(sync_id, error_msg)
             
@@ -754,7 +1023,9 @@ def fetch_cancelled_appointments(from_date: str, to_date: str) -> List[Dict[str,
     return fetcher.get_cancelled_appointments(from_date, to_date)
     
     
-def sync_cancelled_appointments_to_database(from_date: str, to_date: str, table_name: str, truncate: bool) -> Dict[str, Any]:
+def sync_cancelled_appointments_to_database(from_date: str, to_date: str, table_name: str, truncate: bool,
+                                            auth: Optional[RethinkAuth] = None,
+                                            drop_indexes_during_load: Optional[bool] = None) -> Dict[str, Any]:
     """
     Convenience function to sync cancelled appointments to a database table without creating a class instance.
     
@@ -763,6 +1034,9 @@ def sync_cancelled_appointments_to_database(from_date: str, to_date: str, table_
         to_date: End date string in ISO format (YYYY-MM-DD), required
         table_name: Name of the database table to insert data into, required
         truncate: Whether to truncate the table before inserting data, required
+        auth: Optional shared RethinkAuth instance; if omitted, a new session is opened and closed
+        drop_indexes_during_load: Rebuild secondary indexes after a truncating load instead of
+            maintaining them row by row (default: DB_DROP_INDEXES_DURING_LOAD)
         
     Returns:
         Dictionary containing sync results and statistics
@@ -781,6 +1055,13 @@ def sync_cancelled_appointments_to_database(from_date: str, to_date: str, table_
         logger.error(error_msg)
         raise CancelledAppointmentsError(error_msg)
     
-    # Create fetcher and sync
-    fetcher = CancelledAppointmentsFetcher(auth=None, table_name=table_name)
-    return fetcher.sync_to_database(from_date, to_date, truncate)
+    if auth is not None:
+        fetcher = CancelledAppointmentsFetcher(auth=auth, table_name=table_name,
+                                               drop_indexes_during_load=drop_indexes_during_load)
+        return fetcher.sync_to_database(from_date, to_date, truncate)
+    
+    # Create fetcher and sync; every page shares the auth session's keep-alive pool
+    with RethinkAuth() as auth:
+        fetcher = CancelledAppointmentsFetcher(auth=auth, table_name=table_name,
+                                               drop_indexes_during_load=drop_indexes_during_load)
+        return fetcher.sync_to_database(from_date, to_date, truncate)
@@ -4,13 +4,16 @@ Configuration module for Rethink BH Sync application.
 Centralizes all configuration constants and settings.
 """
 
+import importlib.util
 import os
-import logging
-from typing import Dict, Any, Optional
-from dotenv import load_dotenv
+import types
+from typing import Any, List, Mapping, Optional
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from a local .env, if there is one (deployed containers have none)
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 class Config:
     """Application configuration class."""
@@ -23,58 +26,78 @@ class Config:
     # Server settings
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8080))
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # uvicorn worker processes
+    
+    # Response compression; 0 disables in-process gzip (e.g. when a proxy compresses instead)
+    GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", 4096))  # bytes
+    GZIP_COMPRESS_LEVEL = 6
     
     # Logging settings
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-    LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s%(context)s"
     
     # Security settings
     API_AUTH_KEY = os.getenv("API_AUTH_KEY")
     
+    # CORS settings; comma-separated origins, "*" allows any
+    CORS_ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ALLOWED_ORIGINS", "*").split(",") if origin.strip()]
+    CORS_MAX_AGE = 86400  # seconds browsers may cache a preflight response
+    
     # Rate limiting settings
     RATE_LIMIT_REQUESTS = 60  # requests per minute
     RATE_LIMIT_WINDOW = 60    # seconds
+    REDIS_URL = os.getenv("REDIS_URL")  # Optional; shares rate-limit counts across instances
+    # Proxies that append to X-Forwarded-For in front of the app (0 = use the peer address; set 1 on Cloud Run)
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
     
     # Rethink BH API settings
     RETHINK_BASE_URL = "https://webapp.rethinkbehavioralhealth.com"
     RETHINK_APPLICATION_KEY = "74569e11-18b4-4122-a58d-a4b830aa12c4"
     RETHINK_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:139.0) Gecko/139.0"
+    RETHINK_MVC_TOKEN_TTL = 1800  # seconds
+    SECRET_CACHE_TTL = 300  # seconds a Secret Manager value is reused before being fetched again
+    
+    # Standard headers for Rethink BH API requests; read-only, shared by every caller
+    _RETHINK_HEADERS = types.MappingProxyType({
+        "Content-Type": "application/json;charset=utf-8",
+        "Accept": "application/json, text/plain, */*",
+        "X-Application-Key": RETHINK_APPLICATION_KEY,
+        "X-Origin": "Angular",
+        "User-Agent": RETHINK_USER_AGENT,
+        "Origin": RETHINK_BASE_URL,
+        "Referer": f"{RETHINK_BASE_URL}/Healthcare#/Login",
+    })
     
     # Google Cloud settings
     GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
     
     # Request timeout settings
     REQUEST_TIMEOUT = 120  # seconds
+
+    # HTTP connection pool settings
+    HTTP_POOL_SIZE = 32
+    HTTP_MAX_RETRIES = 3
+    HTTP_RETRY_BACKOFF = 0.3  # seconds
+
+    # Concurrent page fetches for paginated scheduler endpoints
+    FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 8))
     
     @classmethod
-    def get_rethink_headers(cls) -> Dict[str, str]:
-        """Get standard headers for Rethink BH API requests."""
-        return {
-            "Content-Type": "application/json;charset=utf-8",
-            "Accept": "application/json, text/plain, */*",
-            "X-Application-Key": cls.RETHINK_APPLICATION_KEY,
-            "X-Origin": "Angular",
-            "User-Agent": cls.RETHINK_USER_AGENT,
-            "Origin": cls.RETHINK_BASE_URL,
-            "Referer": f"{cls.RETHINK_BASE_URL}/Healthcare#/Login",
-        }
-    
-    @classmethod
-    def setup_logging(cls) -> logging.Logger:
-        """Configure and return the application logger."""
-        logging.basicConfig(
-            level=getattr(logging, cls.LOG_LEVEL),
-            format=cls.LOG_FORMAT,
-            handlers=[logging.StreamHandler()],
-            force=True  # Override any existing configuration
-        )
-        return logging.getLogger(__name__)
+    def get_rethink_headers(cls) -> Mapping[str, str]:
+        """Get standard headers for Rethink BH API requests (read-only; copy with dict() to modify)."""
+        return cls._RETHINK_HEADERS
 
 class DatabaseConfig:
     """Database-specific configuration."""
     
+    # Connection pool settings
+    POOL_MIN_CONN = 1
+    POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX_CONN", 5))
+    # Drop secondary indexes for truncating bulk loads and rebuild them once afterwards
+    DROP_INDEXES_DURING_LOAD = os.getenv("DB_DROP_INDEXES_DURING_LOAD", "false").lower() in ("1", "true", "yes")
+    
     # Column mapping for Excel to database
-    APPOINTMENT_COLUMN_MAPPING = {
+    APPOINTMENT_COLUMN_MAPPING = types.MappingProxyType({
         'Appointment Type': 'appointmentType',
         'Appointment Tag': 'appointmentTag', 
         'Service Line': 'serviceLine',
@@ -93,24 +116,38 @@ class DatabaseConfig:
         'Notes': 'notes',
         'Created Date': 'createdDate',
         'Modified Date': 'modifiedDate'
-    }
+    })
+    _COLUMNS = tuple(APPOINTMENT_COLUMN_MAPPING.values())
     
     @classmethod
-    def get_appointment_columns(cls) -> list:
-        """Get list of database column names for appointments."""
-        return list(cls.APPOINTMENT_COLUMN_MAPPING.values())
+    def get_appointment_columns(cls) -> tuple:
+        """Get the database column names for appointments (precomputed, read-only)."""
+        return cls._COLUMNS
 
 class HealthCheckConfig:
     """Health check configuration."""
     
     HEALTH_CHECK_TIMEOUT = 5  # seconds
+    # Required to serve requests; google.cloud.secretmanager is optional (only used when
+    # RTHINK_USER/RTHINK_PASS are not set) and must not fail the health check
     DEPENDENCY_CHECKS = [
         "pandas",
         "psycopg2", 
         "requests",
-        "fastapi",
-        "google.cloud.secretmanager"
+        "fastapi"
     ]
+    
+    @classmethod
+    def missing_dependencies(cls) -> List[str]:
+        """Return the DEPENDENCY_CHECKS modules that cannot be found, without importing them."""
+        missing = []
+        for name in cls.DEPENDENCY_CHECKS:
+            try:
+                if importlib.util.find_spec(name) is None:
+                    missing.append(name)
+            except ModuleNotFoundError:  # Parent package is missing
+                missing.append(name)
+        return missing
 
 # Create global config instance
 config = Config()
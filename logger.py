@@ -4,66 +4,232 @@ Centralized logging module for Rethink BH Sync application.
 Provides structured logging with consistent formatting and context.
 """
 
+import atexit
 import logging
+import os
+import queue
 import sys
+import threading
 import time
-import uuid
-from datetime import datetime
+from collections import Counter, deque
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, Any, Optional
 from functools import wraps
+import orjson
 from config import config
 
+# Buffered output is flushed at least this often (seconds); WARNING and above flush immediately
+_FLUSH_INTERVAL = 0.2
+
+# Burst detection: this many records within the window switches from per-record to batched flushing
+_BURST_THRESHOLD = 100
+_BURST_WINDOW = 1.0  # seconds
+_BURST_MAX_PENDING = 1024  # records buffered before a forced flush while bursting
+
+# Resolved once; every StructuredLogger uses the same level
+_LEVEL = getattr(logging, config.LOG_LEVEL, logging.INFO)
+
+class _BurstDetector:
+    """Reports a burst when the last `threshold` records arrived within `window` seconds."""
+
+    def __init__(self, threshold: int = _BURST_THRESHOLD, window: float = _BURST_WINDOW):
+        self._times = deque(maxlen=threshold)
+        self._window = window
+
+    def record(self, timestamp: float) -> bool:
+        times = self._times
+        times.append(timestamp)
+        return len(times) == times.maxlen and timestamp - times[0] < self._window
+
+class _BufferedStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler that adapts its flushing to the record rate.
+
+    At low rates every record is written as it arrives. During a burst (e.g. a large
+    sync) records are held and written as one block by a background timer, or once
+    _BURST_MAX_PENDING records are waiting. WARNING and above always flush immediately.
+
+    Blocks go through the stream (sys.stdout) itself, not a private buffer on fd 1, so
+    they keep their order with anything else printed to it: a log line lands after all
+    output printed before it was emitted, and at most _FLUSH_INTERVAL later than that.
+    """
+
+    def __init__(self, stream, flush_interval: float = _FLUSH_INTERVAL):
+        super().__init__(stream)
+        self._burst = _BurstDetector()
+        self._pending: list = []
+        self._stop_flushing = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, args=(flush_interval,), name="log-flush", daemon=True
+        )
+        self._flusher.start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._pending.append(self.format(record) + self.terminator)
+            bursting = self._burst.record(record.created)
+            if (not bursting or record.levelno >= logging.WARNING
+                    or len(self._pending) >= _BURST_MAX_PENDING):
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        # The timer thread flushes too, so the hand-off of pending lines is under the handler lock
+        with self.lock:
+            if self._pending:
+                block = "".join(self._pending)
+                self._pending.clear()
+                self.stream.write(block)
+            super().flush()
+
+    def _flush_loop(self, interval: float):
+        while not self._stop_flushing.wait(interval):
+            if self._pending:
+                self.flush()
+
+    def close(self):
+        self._stop_flushing.set()
+        try:
+            self.flush()
+        except (OSError, ValueError):  # stdout already closed at interpreter exit
+            pass
+        super().close()
+
+class _ContextFilter(logging.Filter):
+    """Render a record's structured context as ' | {"k": v, ...}' only once a handler accepts it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = getattr(record, "context_kwargs", None)
+        # One JSON object per line so log ingestion gets the fields without regex parsing
+        record.context = (" | " + orjson.dumps(context, default=str).decode()) if context else ""
+        return True
+
+class _CachedTimeFormatter(logging.Formatter):
+    """Formatter that runs localtime/strftime for %(asctime)s once per second, not once per record."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_time = ""
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        # Only the listener thread formats records, so the cache needs no lock
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_time = time.strftime(self.default_time_format, self.converter(second))
+            self._cached_second = second
+        return self.default_msec_format % (self._cached_time, record.msecs)
+
+# Bound once at import; log blocks share sys.stdout's buffer with print() and uvicorn output
+_STDOUT = sys.stdout
+
+# Loggers only enqueue records; a single listener thread formats and writes them
+_LOG_QUEUE: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_QUEUE_HANDLER = QueueHandler(_LOG_QUEUE)
+
+_CONFIGURED = False
+_CONFIGURE_LOCK = threading.Lock()
+
+def _configure_logging() -> None:
+    """Start the stdout handler and queue listener once per process; later calls return immediately."""
+    global _CONFIGURED
+    if _CONFIGURED:
+        return
+    with _CONFIGURE_LOCK:
+        if _CONFIGURED:
+            return
+        stream_handler = _BufferedStreamHandler(_STDOUT)
+        stream_handler.setFormatter(_CachedTimeFormatter(config.LOG_FORMAT, defaults={"context": ""}))
+        stream_handler.addFilter(_ContextFilter())
+        listener = QueueListener(_LOG_QUEUE, stream_handler, respect_handler_level=True)
+        listener.start()
+        # atexit runs in reverse order: drain the queue first, then flush the buffer
+        atexit.register(stream_handler.close)
+        atexit.register(listener.stop)
+        _CONFIGURED = True
+
 class StructuredLogger:
     """Enhanced logger with structured logging capabilities."""
     
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
         self._setup_logger()
+        # Bound once so each log call skips the self.logger.log attribute lookups
+        self._log = self.logger.log
+        self._is_enabled_for = self.logger.isEnabledFor
         
     def _setup_logger(self):
-        """Setup logger with consistent configuration."""
-        # Clear any existing handlers
-        self.logger.handlers.clear()
+        """Setup logger with consistent configuration (idempotent per logger name)."""
+        _configure_logging()
         
-        # Set level
-        self.logger.setLevel(getattr(logging, config.LOG_LEVEL))
+        if self.logger.handlers == [_QUEUE_HANDLER]:
+            return
         
-        # Create formatter
-        formatter = logging.Formatter(config.LOG_FORMAT)
+        # Replace any existing handlers
+        self.logger.handlers.clear()
         
-        # Create and configure handler
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setFormatter(formatter)
+        # Set level
+        self.logger.setLevel(_LEVEL)
         
-        # Add handler to logger
-        self.logger.addHandler(handler)
+        # Hand records to the shared queue; formatting and writing happen on the listener thread
+        self.logger.addHandler(_QUEUE_HANDLER)
         
         # Prevent propagation to avoid duplicate logs
         self.logger.propagate = False
     
+    def is_enabled_for(self, level: int) -> bool:
+        """Return whether a message at this level would be logged; use it to skip building expensive messages."""
+        return self._is_enabled_for(level)
+    
+    # Calls without context go straight to Logger.log, which does its own level check
     def info(self, message: str, **kwargs):
         """Log info message with optional context."""
-        self._log_with_context(logging.INFO, message, **kwargs)
+        if kwargs:
+            self._log_with_context(logging.INFO, message, kwargs)
+        else:
+            self._log(logging.INFO, message)
     
     def warning(self, message: str, **kwargs):
         """Log warning message with optional context."""
-        self._log_with_context(logging.WARNING, message, **kwargs)
+        if kwargs:
+            self._log_with_context(logging.WARNING, message, kwargs)
+        else:
+            self._log(logging.WARNING, message)
     
     def error(self, message: str, **kwargs):
         """Log error message with optional context."""
-        self._log_with_context(logging.ERROR, message, **kwargs)
+        if kwargs:
+            self._log_with_context(logging.ERROR, message, kwargs)
+        else:
+            self._log(logging.ERROR, message)
     
     def debug(self, message: str, **kwargs):
         """Log debug message with optional context."""
-        self._log_with_context(logging.DEBUG, message, **kwargs)
+        if kwargs:
+            self._log_with_context(logging.DEBUG, message, kwargs)
+        else:
+            self._log(logging.DEBUG, message)
+    
+    def exception(self, message: str, **kwargs):
+        """Log error message with the current exception's traceback and optional context."""
+        # The traceback is only formatted if the record is actually emitted
+        if not self._is_enabled_for(logging.ERROR):
+            return
+        self._log(logging.ERROR, message, exc_info=True, extra={"context_kwargs": kwargs} if kwargs else None)
     
-    def _log_with_context(self, level: int, message: str, **kwargs):
+    def _log_with_context(self, level: int, message: str, context: Dict[str, Any]):
         """Log message with additional context."""
-        if kwargs:
-            context_str = " | ".join([f"{k}={v}" for k, v in kwargs.items()])
-            message = f"{message} | {context_str}"
+        # Skip records that would be filtered out
+        if not self._is_enabled_for(level):
+            return
         
-        self.logger.log(level, message)
+        # Context is rendered by _ContextFilter on the listener thread, not here
+        self._log(level, message, extra={"context_kwargs": context})
 
 class RequestLogger:
     """Logger for HTTP request lifecycle tracking."""
@@ -74,14 +240,13 @@ class RequestLogger:
     def log_request_start(self, method: str, path: str, request_id: str = None) -> str:
         """Log the start of a request and return request ID."""
         if not request_id:
-            request_id = str(uuid.uuid4())[:8]
+            request_id = os.urandom(4).hex()
         
         self.logger.info(
             "REQUEST_START",
             method=method,
             path=path,
-            request_id=request_id,
-            timestamp=datetime.now().isoformat()
+            request_id=request_id
         )
         return request_id
     
@@ -91,8 +256,7 @@ class RequestLogger:
             "REQUEST_COMPLETE",
             request_id=request_id,
             status_code=status_code,
-            duration_ms=round(duration * 1000, 2),
-            timestamp=datetime.now().isoformat()
+            duration_ms=round(duration * 1000, 2)
         )
     
     def log_request_error(self, request_id: str, error: str, status_code: int = 500):
@@ -101,24 +265,43 @@ class RequestLogger:
             "REQUEST_ERROR",
             request_id=request_id,
             error=error,
-            status_code=status_code,
-            timestamp=datetime.now().isoformat()
+            status_code=status_code
         )
 
 class SyncLogger:
     """Logger for sync operation tracking."""
+
+    # Per-sync counters and timings, reported once in SYNC_COMPLETE instead of one record per row or batch
+    counters: Dict[str, Counter] = {}
+    _counters_lock = threading.Lock()
     
     def __init__(self, logger: StructuredLogger):
         self.logger = logger
+
+    def inc(self, sync_id: str, key: str, n: int = 1):
+        """Increment an in-memory counter for a sync operation."""
+        with self._counters_lock:
+            self.counters.setdefault(sync_id, Counter())[key] += n
+
+    def timing(self, sync_id: str, key: str, dt: float):
+        """Accumulate elapsed seconds for a sync operation."""
+        self.inc(sync_id, key, dt)
+
+    def _pop_counters(self, sync_id: str) -> Dict[str, Any]:
+        """Remove and return the counters collected for a sync operation."""
+        with self._counters_lock:
+            collected = self.counters.pop(sync_id, None)
+        if not collected:
+            return {}
+        return {key: round(value, 4) if isinstance(value, float) else value for key, value in collected.items()}
     
     def log_sync_start(self, sync_type: str, params: Dict[str, Any] = None) -> str:
         """Log the start of a sync operation."""
-        sync_id = str(uuid.uuid4())[:8]
+        sync_id = os.urandom(4).hex()
         
         log_data = {
             "sync_id": sync_id,
-            "sync_type": sync_type,
-            "timestamp": datetime.now().isoformat()
+            "sync_type": sync_type
         }
         
         if params:
@@ -128,57 +311,108 @@ class SyncLogger:
         return sync_id
     
     def log_sync_complete(self, sync_id: str, stats: Dict[str, Any]):
-        """Log the completion of a sync operation."""
+        """Log the completion of a sync operation, merged with any counters collected for it."""
+        counters = self._pop_counters(sync_id)
+        if counters:
+            stats = {**counters, **stats}
         self.logger.info(
             "SYNC_COMPLETE",
             sync_id=sync_id,
-            timestamp=datetime.now().isoformat(),
             **stats
         )
     
     def log_sync_error(self, sync_id: str, error: str):
-        """Log a sync operation error."""
+        """Log a sync operation error, with the counters collected up to the failure."""
+        counters = self._pop_counters(sync_id)
         self.logger.error(
             "SYNC_ERROR",
-            sync_id=sync_id,
-            error=error,
-            timestamp=datetime.now().isoformat()
+            **{**counters, "sync_id": sync_id, "error": error}
         )
 
+# Sampling for noisy warnings: the first N per key in each window are logged, then one in M
+_SAMPLE_FIRST = 10
+_SAMPLE_EVERY = 100
+_SAMPLE_WINDOW = 60.0  # seconds
+_SAMPLE_MAX_KEYS = 10_000  # expired keys are pruned past this many
+
+class _Sampler:
+    """Per-key log sampler whose suppressed counts are reported when a key's window rolls over."""
+
+    def __init__(self, first: int = _SAMPLE_FIRST, every: int = _SAMPLE_EVERY, window: float = _SAMPLE_WINDOW):
+        self._first = first
+        self._every = every
+        self._window = window
+        self._state: Dict[tuple, list] = {}  # key -> [window_start, seen, suppressed]
+        self._lock = threading.Lock()
+
+    def check(self, key: tuple) -> tuple[bool, int]:
+        """Count an event for key; return (should log it, suppressed count from the key's previous window)."""
+        now = time.monotonic()
+        rolled_up = 0
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self._window:
+                if state is not None:
+                    rolled_up = state[2]
+                elif len(self._state) >= _SAMPLE_MAX_KEYS:
+                    self._prune(now)
+                state = self._state[key] = [now, 0, 0]
+
+            state[1] += 1
+            seen = state[1]
+            should_log = seen <= self._first or (seen - self._first) % self._every == 0
+            if not should_log:
+                state[2] += 1
+        return should_log, rolled_up
+
+    def _prune(self, now: float) -> None:
+        expired = [k for k, (start, _, _) in self._state.items() if now - start >= self._window]
+        for k in expired:
+            del self._state[k]
+
+_auth_sampler = _Sampler()
+
 class AuthLogger:
     """Logger for authentication events."""
     
     def __init__(self, logger: StructuredLogger):
         self.logger = logger
     
+    def _sampled_warning(self, event: str, subject: str, **kwargs):
+        """Log a repeatable warning through the sampler, with a roll-up of what was suppressed."""
+        should_log, suppressed = _auth_sampler.check((event, subject))
+        if suppressed:
+            self.logger.warning(f"{event}_SAMPLED", suppressed=suppressed, window_seconds=_SAMPLE_WINDOW, **kwargs)
+        if should_log:
+            self.logger.warning(event, **kwargs)
+    
     def log_auth_success(self, user: str = None):
         """Log successful authentication."""
         self.logger.info(
             "AUTH_SUCCESS",
-            user=user or "system",
-            timestamp=datetime.now().isoformat()
+            user=user or "system"
         )
     
     def log_auth_failure(self, reason: str, user: str = None):
-        """Log authentication failure."""
-        self.logger.warning(
-            "AUTH_FAILURE",
-            user=user or "unknown",
-            reason=reason,
-            timestamp=datetime.now().isoformat()
-        )
+        """Log authentication failure (sampled per user)."""
+        user = user or "unknown"
+        self._sampled_warning("AUTH_FAILURE", user, user=user, reason=reason)
     
     def log_rate_limit_exceeded(self, ip: str = None):
-        """Log rate limit exceeded event."""
-        self.logger.warning(
-            "RATE_LIMIT_EXCEEDED",
-            ip=ip or "unknown",
-            timestamp=datetime.now().isoformat()
-        )
+        """Log rate limit exceeded event (sampled per IP)."""
+        ip = ip or "unknown"
+        self._sampled_warning("RATE_LIMIT_EXCEEDED", ip, ip=ip)
+
+# StructuredLogger instances by name, so repeated lookups are a dict hit
+_loggers: Dict[str, StructuredLogger] = {}
 
 def get_logger(name: str) -> StructuredLogger:
-    """Get a structured logger instance."""
-    return StructuredLogger(name)
+    """Get a structured logger instance (cached per name)."""
+    logger = _loggers.get(name)
+    if logger is None:
+        # setdefault keeps a single instance if two threads race on first use
+        logger = _loggers.setdefault(name, StructuredLogger(name))
+    return logger
 
 def get_request_logger(logger: StructuredLogger) -> RequestLogger:
     """Get a request logger instance."""
@@ -194,16 +428,18 @@ def get_auth_logger(logger: StructuredLogger) -> AuthLogger:
 
 def log_performance(func):
     """Decorator to log function performance."""
+    logger = get_logger(func.__module__)
+    is_enabled_for = logger.logger.isEnabledFor
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__)
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             
-            if duration > 5.0:  # Log slow operations
+            if duration > 5.0 and is_enabled_for(logging.WARNING):  # Log slow operations
                 logger.warning(
                     "SLOW_OPERATION",
                     function=func.__name__,
@@ -212,7 +448,9 @@ def log_performance(func):
             
             return result
         except Exception as e:
-            duration = time.time() - start_time
+            if not is_enabled_for(logging.ERROR):
+                raise
+            duration = time.perf_counter() - start_time
             logger.error(
                 "OPERATION_ERROR",
                 function=func.__name__,
@@ -4,13 +4,21 @@ FastAPI application for Rethink BH to Supabase sync.
 Designed for Google Cloud Run deployment with webhook support.
 """
 
-import json
-import traceback
-from datetime import datetime
-from typing import Dict, Any
+import asyncio
+import hmac
+import logging
+import math
+import os
+from functools import lru_cache
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
 import time
+from urllib.parse import parse_qsl
 
-from config import config
+import orjson
+
+from config import config, health_config
 from logger import get_logger, get_request_logger, get_auth_logger
 from models import (
     SyncRequest, DashboardRequest, OverTermSyncRequest,
@@ -18,13 +26,14 @@ from models import (
 )
 from rethink_sync import RethinkSync, RethinkSyncError
 from overterm_dashboard import OverTermDashboard, OverTermDashboardError
-from cancelled_appointments import CancelledAppointmentsFetcher
-from auth import RethinkAuthError
+from cancelled_appointments import CancelledAppointmentsFetcher, close_pool
+from auth import RethinkAuth, RethinkAuthError
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from starlette.status import HTTP_429_TOO_MANY_REQUESTS
 from pydantic import ValidationError
 
@@ -39,150 +48,330 @@ app = FastAPI(
     description=config.APP_DESCRIPTION,
     version=config.APP_VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=config.CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "X-Auth-Key"],
+    max_age=config.CORS_MAX_AGE
 )
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+if config.GZIP_MINIMUM_SIZE > 0:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=config.GZIP_MINIMUM_SIZE,
+        compresslevel=config.GZIP_COMPRESS_LEVEL
+    )
 
 # Add rate limiting
-RATE_LIMIT = 60  # requests per minute
-RATE_LIMIT_WINDOW = 60  # seconds
-client_requests = {}
-
-def rate_limit(request: Request):
-    client_ip = request.client.host
-    current_time = time.time()
+RATE_LIMIT = config.RATE_LIMIT_REQUESTS  # requests per window
+RATE_LIMIT_WINDOW = config.RATE_LIMIT_WINDOW  # seconds
+MAX_TRACKED_IPS = 100_000  # least recently seen IPs are evicted past this many
+_REFILL_RATE = RATE_LIMIT / RATE_LIMIT_WINDOW  # tokens per second
+
+# In-process token buckets: client IP -> (tokens left, time of last refill)
+client_buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+# With REDIS_URL set, limits are enforced in Redis and shared by every instance: a sliding window
+# per client IP, stored as a sorted set of request times (ms), checked and updated atomically.
+# ARGV: now, window, limit, unique member; returns {allowed, requests in window, ms until a slot frees}
+_RATE_LIMIT_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {0, count, tonumber(oldest[2]) + window - now}
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, count + 1, 0}
+"""
+_redis = None
+_rate_limit_script = None
+# After a Redis failure, skip it for this long instead of paying a timeout on every request
+_REDIS_COOLDOWN = 30  # seconds
+_REDIS_TIMEOUT = 0.5  # seconds, connect and per-command
+_redis_down_until = 0.0  # time.monotonic() deadline; 0.0 while Redis is healthy
+
+@app.on_event("startup")
+async def init_rate_limiter():
+    """Connect the shared Redis rate limiter if REDIS_URL is configured."""
+    global _redis, _rate_limit_script
+    if not config.REDIS_URL:
+        return
+    try:
+        import redis.asyncio as redis_asyncio
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using in-process rate limiting")
+        return
+    _redis = redis_asyncio.from_url(
+        config.REDIS_URL, socket_connect_timeout=_REDIS_TIMEOUT, socket_timeout=_REDIS_TIMEOUT
+    )
+    _rate_limit_script = _redis.register_script(_RATE_LIMIT_LUA)
+    logger.info("Using Redis for rate limiting")
+
+@app.on_event("shutdown")
+async def close_rate_limiter():
+    """Close the Redis rate limiter connection."""
+    if _redis is not None:
+        await _redis.aclose()
+
+def _local_rate_limit(client_ip: str, current_time: float) -> tuple[bool, int, int]:
+    """Take a token from the client's bucket; return (allowed, requests remaining, seconds until a token is free)."""
+    # No awaits in here, so the event loop runs it atomically
+    tokens, last_refill = client_buckets.get(client_ip, (RATE_LIMIT, current_time))
+    tokens = min(RATE_LIMIT, tokens + (current_time - last_refill) * _REFILL_RATE)
     
-    if client_ip not in client_requests:
-        client_requests[client_ip] = []
+    if tokens < 1:
+        client_buckets[client_ip] = (tokens, current_time)
+        allowed, retry_after = False, math.ceil((1 - tokens) / _REFILL_RATE)
+    else:
+        tokens -= 1
+        client_buckets[client_ip] = (tokens, current_time)
+        allowed, retry_after = True, 0
     
-    # Clean up old requests
-    client_requests[client_ip] = [t for t in client_requests[client_ip] if t > current_time - RATE_LIMIT_WINDOW]
+    client_buckets.move_to_end(client_ip)
+    if len(client_buckets) > MAX_TRACKED_IPS:
+        client_buckets.popitem(last=False)
+    return allowed, int(tokens), retry_after
+
+_BUCKET_SWEEP_INTERVAL = 60  # seconds
+_bucket_sweeper = None
+
+async def _sweep_idle_buckets():
+    """Periodically drop buckets idle for a full window; they have refilled completely, so nothing is lost."""
+    while True:
+        await asyncio.sleep(_BUCKET_SWEEP_INTERVAL)
+        cutoff = time.time() - RATE_LIMIT_WINDOW
+        # Buckets are kept in least-recently-used order, so idle ones are all at the front
+        while client_buckets:
+            ip, (_, last_refill) = next(iter(client_buckets.items()))
+            if last_refill >= cutoff:
+                break
+            del client_buckets[ip]
+
+@app.on_event("startup")
+async def start_bucket_sweeper():
+    """Start the idle rate-limit bucket sweeper."""
+    global _bucket_sweeper
+    _bucket_sweeper = asyncio.create_task(_sweep_idle_buckets())
+
+@app.on_event("shutdown")
+async def stop_bucket_sweeper():
+    """Stop the idle rate-limit bucket sweeper."""
+    if _bucket_sweeper is not None:
+        _bucket_sweeper.cancel()
+
+def _client_ip(request: Request) -> str:
+    """Client IP for rate limiting: the X-Forwarded-For entry added by the outermost trusted proxy, else the peer address."""
+    # Entries to the left of the trusted hops are client-supplied and can be spoofed
+    if config.TRUSTED_PROXY_HOPS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = forwarded.split(",")
+            if len(hops) >= config.TRUSTED_PROXY_HOPS:
+                return hops[-config.TRUSTED_PROXY_HOPS].strip()
+    return request.client.host if request.client else "unknown"
+
+async def rate_limit(request: Request, response: Response) -> bool:
+    """Route dependency enforcing RATE_LIMIT per client IP; sets X-RateLimit-Remaining (and Retry-After when exceeded)."""
+    global _redis_down_until
+    client_ip = _client_ip(request)
+    current_time = time.time()
     
-    if len(client_requests[client_ip]) >= RATE_LIMIT:
+    result = None
+    if _rate_limit_script is not None and time.monotonic() >= _redis_down_until:
+        now_ms = int(current_time * 1000)
+        try:
+            allowed, count, retry_ms = await _rate_limit_script(
+                keys=[f"rl:{client_ip}"],
+                args=[now_ms, RATE_LIMIT_WINDOW * 1000, RATE_LIMIT, f"{now_ms}-{os.urandom(4).hex()}"]
+            )
+            result = (bool(allowed), max(0, RATE_LIMIT - count), math.ceil(retry_ms / 1000))
+            if _redis_down_until:
+                _redis_down_until = 0.0
+                logger.info("Redis rate limiter recovered")
+        except Exception as e:
+            # Log only the transition to down, not every retry after a cool-down
+            if not _redis_down_until:
+                logger.warning(f"Redis rate limiter unavailable, falling back to in-process limiting for {_REDIS_COOLDOWN}s at a time: {e}")
+            _redis_down_until = time.monotonic() + _REDIS_COOLDOWN
+    if result is None:
+        result = _local_rate_limit(client_ip, current_time)
+    allowed, remaining, retry_after = result
+    
+    if not allowed:
         raise HTTPException(
             status_code=HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please wait before making another request."
+            detail="Rate limit exceeded. Please wait before making another request.",
+            headers={"Retry-After": str(retry_after), "X-RateLimit-Remaining": "0"}
         )
     
-    client_requests[client_ip].append(current_time)
+    response.headers["X-RateLimit-Remaining"] = str(remaining)
     return True
 
+# One Rethink session, and its keep-alive connection pool, shared by every request.
+# The services keep per-run state, so each request still wraps it in a fresh one.
+@lru_cache(maxsize=1)
+def get_rethink_auth() -> RethinkAuth:
+    """Return the process-wide RethinkAuth instance."""
+    return RethinkAuth()
+
+@app.on_event("startup")
+async def init_rethink_auth():
+    """Create the shared Rethink session before the first request."""
+    get_rethink_auth()
+
+@app.on_event("shutdown")
+async def close_rethink_auth():
+    """Close the shared Rethink session."""
+    get_rethink_auth().close()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Close the pooled database connections."""
+    close_pool()
+
 # Optional simple authorization
 AUTH_KEY = config.API_AUTH_KEY
 
-def check_auth(request: Request) -> bool:
-    """Simple authorization check if AUTH_KEY is set."""
+_AUTH_KEY_BYTES = AUTH_KEY.encode() if AUTH_KEY else None
+
+def _auth_key_matches(candidate) -> bool:
+    """Constant-time comparison of a supplied key against AUTH_KEY."""
+    return isinstance(candidate, str) and hmac.compare_digest(candidate.encode(), _AUTH_KEY_BYTES)
+
+def _scope_auth_key_matches(scope) -> bool:
+    """Check the X-Auth-Key header, then the auth_key query parameter, straight from the ASGI scope."""
+    for name, value in scope["headers"]:
+        if name == b"x-auth-key":
+            if hmac.compare_digest(value, _AUTH_KEY_BYTES):
+                return True
+            break
+    
+    # The query string is only parsed when the header didn't match
+    query_string = scope["query_string"]
+    if query_string:
+        for name, value in parse_qsl(query_string.decode("latin-1")):
+            if name == "auth_key" and _auth_key_matches(value):
+                return True
+    return False
+
+def check_auth(request: Request, body_auth_key: Optional[str] = None) -> bool:
+    """Simple authorization check if AUTH_KEY is set; accepts the key from the body, X-Auth-Key header or query string."""
     if not AUTH_KEY:
         return True  # No auth required if key not set
     
-    # Check for auth key in query params or headers
-    auth_from_query = request.query_params.get("auth_key")
-    auth_from_header = request.headers.get("X-Auth-Key")
-    
-    if not (auth_from_query == AUTH_KEY or auth_from_header == AUTH_KEY):
+    if not (_auth_key_matches(body_auth_key) or _scope_auth_key_matches(request.scope)):
         raise HTTPException(
             status_code=401,
             detail="Invalid authentication credentials"
         )
     return True
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    
-    # Log request details
-    logger.info(f"Request received: {request.method} {request.url.path}")
-    logger.debug(f"Headers: {dict(request.headers)}")
-    
-    response = await call_next(request)
-    
-    # Log response details
-    process_time = time.time() - start_time
-    logger.info(f"Request completed in {process_time:.4f} seconds")
-    logger.debug(f"Status code: {response.status_code}")
-    
-    return response
-
-@app.exception_handler(RethinkSyncError)
-async def rethink_sync_exception_handler(request: Request, exc: RethinkSyncError):
-    """Handle RethinkSyncError exceptions."""
-    logger.error(f"Sync error: {str(exc)}")
-    return JSONResponse(
-        status_code=500,
-        content={
-            "status": "error",
-            "message": str(exc),
-            "timestamp": datetime.now().isoformat()
-        }
-    )
+# Health probes arrive every few seconds; logging them would drown out real traffic
+_UNLOGGED_PATHS = frozenset({"/health", "/ready"})
 
-@app.exception_handler(RethinkAuthError)
-async def rethink_auth_exception_handler(request: Request, exc: RethinkAuthError):
-    """Handle RethinkAuthError exceptions."""
-    logger.error(f"Authentication error: {str(exc)}")
-    return JSONResponse(
-        status_code=401,
-        content={
-            "status": "error",
-            "message": f"Authentication failed: {str(exc)}",
-            "timestamp": datetime.now().isoformat()
-        }
+class RequestLoggingMiddleware:
+    """Pure ASGI request logging; avoids the per-request task group and Request/Response wrappers of BaseHTTPMiddleware."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in _UNLOGGED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
+        # Log request details
+        logger.info(f"Request received: {scope['method']} {scope['path']}")
+        if logger.is_enabled_for(logging.DEBUG):
+            logger.debug(f"Headers: {dict((k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers'])}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Log response details
+                process_time_ms = (time.perf_counter() - start_time) * 1000
+                logger.info(
+                    f"Request completed: {scope['method']} {scope['path']} "
+                    f"{message['status']} in {process_time_ms:.1f} ms"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+# Added last so it is the outermost middleware and times CORS and GZip as well
+app.add_middleware(RequestLoggingMiddleware)
+
+def _error_response(status_code: int, message: str) -> Response:
+    """Build the standard JSON error body, serialized straight to bytes."""
+    return Response(
+        content=orjson.dumps({"status": "error", "message": message, "timestamp": datetime.now(timezone.utc).isoformat()}),
+        status_code=status_code,
+        media_type="application/json"
     )
 
-@app.exception_handler(OverTermDashboardError)
-async def overterm_dashboard_exception_handler(request: Request, exc: OverTermDashboardError):
-    """Handle OverTermDashboardError exceptions."""
-    logger.error(f"Dashboard error: {str(exc)}")
-    return JSONResponse(
-        status_code=500,
-        content={
-            "status": "error",
-            "message": str(exc),
-            "timestamp": datetime.now().isoformat()
-        }
+# Service exceptions: (status code, log label, response message prefix)
+_EXCEPTION_RESPONSES = {
+    RethinkSyncError: (500, "Sync error", ""),
+    RethinkAuthError: (401, "Authentication error", "Authentication failed: "),
+    OverTermDashboardError: (500, "Dashboard error", ""),
+}
+
+async def service_exception_handler(request: Request, exc: Exception):
+    """Handle the service exceptions listed in _EXCEPTION_RESPONSES (including subclasses)."""
+    status_code, label, prefix = next(
+        _EXCEPTION_RESPONSES[cls] for cls in type(exc).__mro__ if cls in _EXCEPTION_RESPONSES
     )
+    logger.error(f"{label}: {str(exc)}")
+    return _error_response(status_code, f"{prefix}{str(exc)}")
+
+for exc_class in _EXCEPTION_RESPONSES:
+    app.add_exception_handler(exc_class, service_exception_handler)
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle unexpected exceptions."""
-    logger.error(f"Unexpected error: {str(exc)}")
-    logger.error(traceback.format_exc())
-    return JSONResponse(
-        status_code=500,
-        content={
-            "status": "error",
-            "message": "Internal server error",
-            "timestamp": datetime.now().isoformat()
-        }
-    )
+    logger.exception(f"Unexpected error: {str(exc)}")
+    return _error_response(500, "Internal server error")
+
+# Static response bodies, serialized once
+_ROOT_BODY = orjson.dumps({
+    "service": config.APP_NAME,
+    "version": config.APP_VERSION,
+    "status": "running",
+    "endpoints": {
+        "sync": "POST /run",
+        "overterm-dashboard": "POST /overterm-dashboard",
+        "overterm-sync": "POST /overterm-sync",
+        "cancelled-appointments": "POST /cancelled-appointments",
+        "health": "GET /health",
+        "ready": "GET /ready",
+        "docs": "GET /docs"
+    }
+})
+_READY_BODY = orjson.dumps({"status": "ready"})
 
 @app.get("/")
 async def root():
     """Root endpoint with basic service information."""
-    return {
-        "service": config.APP_NAME,
-        "version": config.APP_VERSION,
-        "status": "running",
-        "endpoints": {
-            "sync": "POST /run",
-            "overterm-dashboard": "POST /overterm-dashboard",
-            "overterm-sync": "POST /overterm-sync",
-            "cancelled-appointments": "POST /cancelled-appointments",
-            "health": "GET /health",
-            "ready": "GET /ready",
-            "docs": "GET /docs"
-        }
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
+
+# Installed packages don't change while the process runs, so dependencies are checked once at startup
+_MISSING_DEPENDENCIES = health_config.missing_dependencies()
+if _MISSING_DEPENDENCIES:
+    logger.error(f"Dependency missing: {', '.join(_MISSING_DEPENDENCIES)}")
 
 @app.get("/health")
 async def health_check():
@@ -196,7 +385,7 @@ async def health_check():
     """
     health_status = {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
         "service": config.APP_NAME,
         "version": config.APP_VERSION
     }
@@ -213,23 +402,21 @@ async def health_check():
     # This is just to verify the server is online for Cloud Run scaling
     checks["secrets"] = "pass"  # Always pass for Cloud Run scaling
 
-    # Check critical imports
-    try:
-        for dependency in ["pandas", "psycopg2", "requests", "fastapi"]:
-            __import__(dependency)
-        checks["dependencies"] = "pass"
-    except ImportError as e:
+    # Critical dependencies were located at startup
+    if _MISSING_DEPENDENCIES:
         checks["dependencies"] = "fail"
         health_status["status"] = "unhealthy"
-        logger.error(f"Health check - dependency missing: {str(e)}")
+        logger.error(f"Health check - dependency missing: {', '.join(_MISSING_DEPENDENCIES)}")
+    else:
+        checks["dependencies"] = "pass"
 
     health_status["checks"] = checks
 
     # Return appropriate HTTP status
     if health_status["status"] == "unhealthy":
-        return JSONResponse(status_code=503, content=health_status)
+        return ORJSONResponse(status_code=503, content=health_status)
     elif health_status["status"] == "degraded":
-        return JSONResponse(status_code=200, content=health_status)
+        return ORJSONResponse(status_code=200, content=health_status)
     else:
         return health_status
 
@@ -239,13 +426,13 @@ async def readiness_check():
     Kubernetes-style readiness check.
     Simple endpoint that returns 200 if the service is ready to accept traffic.
     """
-    return {"status": "ready", "timestamp": datetime.now().isoformat()}
+    return Response(content=_READY_BODY, media_type="application/json")
 
 
 
 
 
-@app.post("/run", response_model=SyncResponse, tags=["Sync Operations"], summary="Run Sync Operation")
+@app.post("/run", response_model=SyncResponse, tags=["Sync Operations"], summary="Run Sync Operation", dependencies=[Depends(rate_limit)])
 async def run_sync_post(request: Request) -> Dict[str, Any]:
     """
     POST version of the sync endpoint for webhook compatibility.
@@ -260,102 +447,60 @@ async def run_sync_post(request: Request) -> Dict[str, Any]:
     """
     try:
         # Parse JSON body
-        body = await request.json()
+        body = orjson.loads(await request.body())
         
-        # Check for required fields
-        if 'from_date' not in body:
-            logger.error("Malformed request: Missing required field 'from_date'")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "message": "Missing required field: from_date",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
-            
-        if 'to_date' not in body:
-            logger.error("Malformed request: Missing required field 'to_date'")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "message": "Missing required field: to_date",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
-            
-        if 'table_name' not in body:
-            logger.error("Malformed request: Missing required field 'table_name'")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "message": "Missing required field: table_name",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
+        # Validate required fields, date formats and table name in one pass
+        try:
+            req_model = SyncRequest.model_validate(body)
+        except ValidationError as e:
+            logger.error(f"Malformed request: {e}")
+            return _error_response(400, f"Validation error: {str(e)}")
         
-        from_date = body['from_date']
-        to_date = body['to_date']
-        table_name = body['table_name']
+        from_date = req_model.from_date
+        to_date = req_model.to_date
+        table_name = req_model.table_name
         
-        # If auth_key is in the body, add it to the query params for the GET handler
-        if 'auth_key' in body:
-            request.scope['query_string'] = f"auth_key={body['auth_key']}"
+        body_auth_key = req_model.auth_key
             
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         # Invalid JSON format
         logger.error(f"Malformed request: Invalid JSON format - {e}")
-        return JSONResponse(
-            status_code=400,
-            content={
-                "status": "error",
-                "message": "Invalid JSON format in request body",
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        return _error_response(400, "Invalid JSON format in request body")
     except Exception as e:
         # Other unexpected errors
         logger.error(f"Error processing request body: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "status": "error",
-                "message": f"Error processing request: {str(e)}",
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        return _error_response(500, f"Error processing request: {str(e)}")
 
     # Check authorization if enabled
-    if not check_auth(request):
+    if not check_auth(request, body_auth_key):
         logger.warning("Unauthorized sync attempt")
         raise HTTPException(
             status_code=401,
             detail="Unauthorized: Invalid or missing auth key"
         )
 
-    start_time = datetime.now()
-    logger.info(f"Sync request received at {start_time.isoformat()}")
+    start_time = time.perf_counter()
+    logger.info(f"Sync request received at {datetime.now(timezone.utc).isoformat()}")
 
     try:
         # Initialize sync service
-        sync_service = RethinkSync()
+        sync_service = RethinkSync(auth=get_rethink_auth())
 
         # Execute sync with parameters
-        result = sync_service.run_sync(
+        # Blocking HTTP and database work runs off the event loop
+        result = await run_in_threadpool(
+            sync_service.run_sync,
             from_date=from_date,
             to_date=to_date,
             table_name=table_name
         )
 
         # Add timing information
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
+        duration = time.perf_counter() - start_time
 
         response = {
             **result,
-            "timestamp": end_time.isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "duration_seconds": round(duration, 2),
             "message": "Sync completed successfully"
         }
@@ -365,28 +510,25 @@ async def run_sync_post(request: Request) -> Dict[str, Any]:
 
     except RethinkSyncError as e:
         # Log specific sync errors with context
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
+        duration = time.perf_counter() - start_time
         logger.error(f"Sync failed after {duration:.2f}s: {str(e)}")
         # Re-raise to be handled by exception handler
         raise e
     except Exception as e:
         # Log and re-raise unexpected errors with full context
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        logger.error(f"Unexpected error in sync endpoint after {duration:.2f}s: {str(e)}")
-        logger.error(traceback.format_exc())
+        duration = time.perf_counter() - start_time
+        logger.exception(f"Unexpected error in sync endpoint after {duration:.2f}s: {str(e)}")
         raise e
 
 
 
 
 
-@app.post("/overterm-dashboard", response_model=DashboardResponse, tags=["Sync Operations"], summary="Get Overterm Dashboard Post")
+@app.post("/overterm-dashboard", response_model=DashboardResponse, tags=["Sync Operations"], summary="Get Overterm Dashboard Post", dependencies=[Depends(rate_limit)])
 async def get_overterm_dashboard_post(request: Request) -> Dict[str, Any]:
     """POST version of the overterm-dashboard endpoint."""
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
 
         # Extract parameters
         start_date = body.get('start_date')
@@ -395,65 +537,64 @@ async def get_overterm_dashboard_post(request: Request) -> Dict[str, Any]:
         # Handle both client_id and client_ids for backward compatibility
         client_ids = body.get('client_ids') or body.get('client_id')
 
-        # Handle auth_key in body
-        if 'auth_key' in body:
-            request.scope['query_string'] = f"auth_key={body['auth_key']}"
+        body_auth_key = body.get('auth_key')
 
         # Check authorization if enabled
-        if not check_auth(request):
+        if not check_auth(request, body_auth_key):
             logger.warning("Unauthorized dashboard request")
             raise HTTPException(
                 status_code=401,
                 detail="Unauthorized: Invalid or missing auth key"
             )
 
-        # Apply rate limiting
-        rate_limit(request)
-
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         logger.info("Over Term dashboard request received")
 
         try:
             # Fetch dashboard data
-            dashboard_service = OverTermDashboard()
-            result = dashboard_service.get_dashboard_data(
+            dashboard_service = OverTermDashboard(auth=get_rethink_auth())
+            result = await run_in_threadpool(
+                dashboard_service.get_dashboard_data,
                 start_date=start_date,
                 end_date=end_date,
                 client_ids=client_ids
             )
 
             # Add timing
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             result["duration_seconds"] = round(duration, 2)
 
             logger.info(f"Dashboard request completed in {duration:.2f}s")
             return result
 
         except (RethinkAuthError, OverTermDashboardError) as e:
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             logger.error(f"Dashboard request failed after {duration:.2f}s: {e}")
             raise
         except Exception as e:
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             logger.error(f"Unexpected error after {duration:.2f}s: {e}")
             raise
 
-    except json.JSONDecodeError:
-        logger.error("Invalid JSON in request body")
-        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    except HTTPException:
+        # Auth and rate-limit rejections keep their status code and headers
+        raise
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Malformed request: Invalid JSON format - {e}")
+        return _error_response(400, "Invalid JSON format in request body")
     except Exception as e:
         logger.error(f"Error processing request body: {e}")
-        raise HTTPException(status_code=500, detail="Error processing request")
+        return _error_response(500, f"Error processing request: {str(e)}")
 
 
 
 
 
-@app.post("/overterm-sync", response_model=SyncResponse, tags=["Sync Operations"], summary="Sync Overterm Dashboard Post")
+@app.post("/overterm-sync", response_model=SyncResponse, tags=["Sync Operations"], summary="Sync Overterm Dashboard Post", dependencies=[Depends(rate_limit)])
 async def sync_overterm_dashboard_post(request: Request) -> Dict[str, Any]:
     """POST version of the overterm-sync endpoint."""
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
 
         # Extract parameters
         start_date = body.get('start_date')
@@ -465,25 +606,21 @@ async def sync_overterm_dashboard_post(request: Request) -> Dict[str, Any]:
         # Use default table name for overterm-sync endpoint
         table_name = body.get('table_name', 'overterm_dashboard')
 
-        # Handle auth_key in body
-        if 'auth_key' in body:
-            request.scope['query_string'] = f"auth_key={body['auth_key']}"
+        body_auth_key = body.get('auth_key')
 
         # Check authorization
-        if not check_auth(request):
+        if not check_auth(request, body_auth_key):
             logger.warning("Unauthorized Over Term sync request")
             raise HTTPException(status_code=401, detail="Unauthorized: Invalid or missing auth key")
 
-        # Apply rate limiting
-        rate_limit(request)
-
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         logger.info("Over Term sync request received")
 
         try:
             # Perform sync
-            dashboard_service = OverTermDashboard()
-            result = dashboard_service.sync_to_database(
+            dashboard_service = OverTermDashboard(auth=get_rethink_auth())
+            result = await run_in_threadpool(
+                dashboard_service.sync_to_database,
                 start_date=start_date,
                 end_date=end_date,
                 client_ids=client_ids,
@@ -491,32 +628,35 @@ async def sync_overterm_dashboard_post(request: Request) -> Dict[str, Any]:
             )
 
             # Add timing
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             result["duration_seconds"] = round(duration, 2)
 
             logger.info(f"Over Term sync completed in {duration:.2f}s: {result.get('records_inserted', 0)} records")
             return result
 
         except (RethinkAuthError, OverTermDashboardError) as e:
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             logger.error(f"Over Term sync failed after {duration:.2f}s: {e}")
             raise
         except Exception as e:
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             logger.error(f"Unexpected error in Over Term sync after {duration:.2f}s: {e}")
             raise
 
-    except json.JSONDecodeError:
-        logger.error("Invalid JSON in request body")
-        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    except HTTPException:
+        # Auth and rate-limit rejections keep their status code and headers
+        raise
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Malformed request: Invalid JSON format - {e}")
+        return _error_response(400, "Invalid JSON format in request body")
     except Exception as e:
         logger.error(f"Error processing request body: {e}")
-        raise HTTPException(status_code=500, detail="Error processing request")
+        return _error_response(500, f"Error processing request: {str(e)}")
 
 # Cloud Run requires the app to listen on the PORT environment variable
 
 
-@app.post("/cancelled-appointments-sync", response_model=SyncResponse, tags=["Sync Operations"], summary="Sync Cancelled Appointments to Database")
+@app.post("/cancelled-appointments-sync", response_model=SyncResponse, tags=["Sync Operations"], summary="Sync Cancelled Appointments to Database", dependencies=[Depends(rate_limit)])
 async def sync_cancelled_appointments_post(request: Request) -> Dict[str, Any]:
     """
     Sync cancelled appointments from Rethink BH to a specified database table.
@@ -549,7 +689,7 @@ async def sync_cancelled_appointments_post(request: Request) -> Dict[str, Any]:
     """
     try:
         # Parse JSON body
-        body = await request.json()
+        body = orjson.loads(await request.body())
         
         # Validate using Pydantic model
         try:
@@ -557,14 +697,7 @@ async def sync_cancelled_appointments_post(request: Request) -> Dict[str, Any]:
             req_model = CancelledAppointmentsRequest(**body)
         except ValueError as e:
             logger.error(f"Validation error: {e}")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "message": f"Validation error: {str(e)}",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
+            return _error_response(400, f"Validation error: {str(e)}")
         
         # Extract validated fields
         from_date = req_model.from_date
@@ -572,65 +705,47 @@ async def sync_cancelled_appointments_post(request: Request) -> Dict[str, Any]:
         table_name = req_model.table_name
         truncate = req_model.truncate
         
-        # If auth_key is in the body, add it to the query params for the GET handler
-        if req_model.auth_key:
-            request.scope['query_string'] = f"auth_key={req_model.auth_key}"
+        body_auth_key = req_model.auth_key
             
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         # Invalid JSON format
         logger.error(f"Malformed request: Invalid JSON format - {e}")
-        return JSONResponse(
-            status_code=400,
-            content={
-                "status": "error",
-                "message": "Invalid JSON format in request body",
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        return _error_response(400, "Invalid JSON format in request body")
     except Exception as e:
         # Other unexpected errors
         logger.error(f"Error processing request body: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "status": "error",
-                "message": f"Error processing request: {str(e)}",
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        return _error_response(500, f"Error processing request: {str(e)}")
 
     # Check authorization if enabled
-    if not check_auth(request):
+    if not check_auth(request, body_auth_key):
         logger.warning("Unauthorized cancelled appointments sync attempt")
         raise HTTPException(
             status_code=401,
             detail="Unauthorized: Invalid or missing auth key"
         )
 
-    start_time = datetime.now()
-    logger.info(f"Cancelled appointments sync request received at {start_time.isoformat()}")
+    start_time = time.perf_counter()
+    logger.info(f"Cancelled appointments sync request received at {datetime.now(timezone.utc).isoformat()}")
 
     try:
-        # Initialize auth
-        from auth import RethinkAuth
         from cancelled_appointments import sync_cancelled_appointments_to_database
-        auth = RethinkAuth()
         
         # Execute sync with parameters
-        result = sync_cancelled_appointments_to_database(
+        result = await run_in_threadpool(
+            sync_cancelled_appointments_to_database,
             from_date=from_date,
             to_date=to_date,
             table_name=table_name,
-            truncate=truncate
+            truncate=truncate,
+            auth=get_rethink_auth()
         )
 
         # Add timing information
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
+        duration = time.perf_counter() - start_time
 
         response = {
             **result,
-            "timestamp": end_time.isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "duration_seconds": round(duration, 2)
         }
 
@@ -639,10 +754,8 @@ async def sync_cancelled_appointments_post(request: Request) -> Dict[str, Any]:
 
     except Exception as e:
         # Log and re-raise unexpected errors with full context
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        logger.error(f"Unexpected error in cancelled appointments sync endpoint after {duration:.2f}s: {str(e)}")
-        logger.error(traceback.format_exc())
+        duration = time.perf_counter() - start_time
+        logger.exception(f"Unexpected error in cancelled appointments sync endpoint after {duration:.2f}s: {str(e)}")
         raise e
 
 
@@ -652,12 +765,15 @@ if __name__ == "__main__":
     port = config.PORT
     host = config.HOST
     
-    logger.info(f"Starting server on {host}:{port}")
+    logger.info(f"Starting server on {host}:{port} with {config.WEB_CONCURRENCY} worker(s)")
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
+        loop="auto",  # uvloop/httptools when installed, asyncio/h11 otherwise
+        http="auto",
+        workers=config.WEB_CONCURRENCY,
         log_level="info",
         access_log=True
     )
@@ -8,9 +8,9 @@ import os
 import psycopg2
 import re
 from datetime import datetime
+from itertools import chain
 from typing import Dict, Any, List
 from urllib.parse import urlparse
-from google.cloud import secretmanager
 
 from config import config
 from logger import get_logger, get_sync_logger, log_performance
@@ -325,44 +325,34 @@ class OverTermDashboard:
         # Batch size for insertion
         batch_size = 50  # Smaller batch size for complex data
 
+        # Build the INSERT once; only the final partial batch needs a different placeholder count
+        column_list = """
+            clientname, fundername, serviceline, authorizationnumber,
+            authorizationunit, dates, billingcodes, servicename,
+            billcode, schedulinggoal, totalschedgoal, totalauthhours,
+            schedhours, unschedhours, verifiedhours, schedauth,
+            schedgoal, daysuntilexpiration, authorizationstatus,
+            renderingprovider, procedurecodeid, referringprovidername
+        """
+        num_values = 22
+        if client_id is not None:
+            column_list += ', "clientID"'
+            num_values += 1
+        row_placeholder = '(' + ','.join(['%s'] * num_values) + ')'
+        insert_prefix = f'INSERT INTO "{table_name}" ({column_list}) VALUES '
+        full_batch_sql = insert_prefix + ','.join([row_placeholder] * batch_size)
+
         try:
             with conn.cursor() as cur:
                 for i in range(0, len(all_values), batch_size):
                     batch = all_values[i:i+batch_size]
 
-                    # Construct batch insert query
-                    # Check if client_id is included
-                    has_client_id = client_id is not None
-                    
-                    if has_client_id:
-                        placeholders = ','.join(['(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)'] * len(batch))
-                        column_list = """
-                            clientname, fundername, serviceline, authorizationnumber,
-                            authorizationunit, dates, billingcodes, servicename,
-                            billcode, schedulinggoal, totalschedgoal, totalauthhours,
-                            schedhours, unschedhours, verifiedhours, schedauth,
-                            schedgoal, daysuntilexpiration, authorizationstatus,
-                            renderingprovider, procedurecodeid, referringprovidername,
-                            "clientID"
-                        """
+                    if len(batch) == batch_size:
+                        query = full_batch_sql
                     else:
-                        placeholders = ','.join(['(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)'] * len(batch))
-                        column_list = """
-                            clientname, fundername, serviceline, authorizationnumber,
-                            authorizationunit, dates, billingcodes, servicename,
-                            billcode, schedulinggoal, totalschedgoal, totalauthhours,
-                            schedhours, unschedhours, verifiedhours, schedauth,
-                            schedgoal, daysuntilexpiration, authorizationstatus,
-                            renderingprovider, procedurecodeid, referringprovidername
-                        """
-                    
-                    flattened_values = [item for sublist in batch for item in sublist]
+                        query = insert_prefix + ','.join([row_placeholder] * len(batch))
 
-                    query = f"""
-                        INSERT INTO "{table_name}" (
-                            {column_list}
-                        ) VALUES {placeholders}
-                    """
+                    flattened_values = list(chain.from_iterable(batch))
 
                     cur.execute(query, flattened_values)
                     success_count += len(batch)
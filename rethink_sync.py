@@ -7,6 +7,7 @@ Handles downloading appointment data and syncing to Supabase database.
 import os
 import io
 import re
+import time
 import pandas as pd
 import psycopg2
 from datetime import datetime
@@ -391,8 +392,11 @@ class RethinkSync:
 
         return values
 
-    def _insert_data(self, conn, df: pd.DataFrame) -> tuple[int, int]:
-        """Insert DataFrame data into database using batch operations."""
+    def _insert_data(self, conn, df: pd.DataFrame, sync_id: Optional[str] = None) -> tuple[int, int]:
+        """Insert DataFrame data into database using batch operations.
+
+        Per-batch progress is counted against sync_id and reported in SYNC_COMPLETE.
+        """
         logger.info("Starting data insertion")
 
         column_mapping = self._map_excel_to_db_columns(df)
@@ -432,7 +436,8 @@ class RethinkSync:
                     cur.execute(query)
 
                     success_count += len(batch)
-                    logger.info(f"Inserted batch {i//batch_size + 1}, rows {i+1}-{i+len(batch)}")
+                    if sync_id is not None:
+                        sync_logger.inc(sync_id, "batches_inserted")
 
                 conn.commit()
                 logger.info(f"Data insertion completed: {success_count} success, {error_count} errors")
@@ -492,7 +497,9 @@ class RethinkSync:
                 self.auth.authenticate()
 
             # Download Excel data
+            download_start = time.perf_counter()
             df = self._download_excel()
+            sync_logger.timing(sync_id, "download_seconds", time.perf_counter() - download_start)
 
             # Connect to database
             conn = self._connect_database(db_url)
@@ -502,7 +509,9 @@ class RethinkSync:
                 self._truncate_table(conn)
 
                 # Insert data
-                _, error_count = self._insert_data(conn, df)
+                insert_start = time.perf_counter()
+                _, error_count = self._insert_data(conn, df, sync_id)
+                sync_logger.timing(sync_id, "insert_seconds", time.perf_counter() - insert_start)
 
                 logger.info(f"Sync completed: {len(df)} records, {error_count} errors")
 
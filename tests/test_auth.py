@@ -0,0 +1,130 @@
+"""Concurrency tests for RethinkAuth session renewal."""
+
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from auth import RethinkAuth
+
+API_URL = "https://api.example.test/events"
+
+
+def _response(status_code: int, url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    return response
+
+
+class _FakeServer:
+    """Stands in for Session.request: counts logins and lets a test hook API calls."""
+
+    def __init__(self, auth: RethinkAuth):
+        self.auth = auth
+        self.logins = 0
+        self.api_calls = 0
+        self.on_api_call = None  # Optional callable returning a status code
+
+    def request(self, method, url, **kwargs):
+        if url.endswith("/HealthCare"):
+            # Each login hands out a fresh anti-forgery cookie
+            self.auth.session.cookies.set("XSRF-TOKEN", f"token-{self.logins + 1}")
+        elif url.endswith("/HealthCare/User/Login"):
+            self.logins += 1
+        elif url == API_URL:
+            self.api_calls += 1
+            if self.on_api_call:
+                return _response(self.on_api_call(), url)
+        return _response(200, url)
+
+
+@mock.patch.dict(os.environ, {"RTHINK_USER": "user@example.test", "RTHINK_PASS": "secret"})
+class MakeRequestReauthTests(unittest.TestCase):
+
+    def setUp(self):
+        self.auth = RethinkAuth()
+        self.server = _FakeServer(self.auth)
+        self.auth.session.request = self.server.request
+
+    def tearDown(self):
+        self.auth.close()
+
+    def test_unauthorized_response_logs_in_again_and_retries_once(self):
+        self.auth.authenticate()
+        statuses = iter([401, 200])
+        self.server.on_api_call = lambda: next(statuses)
+
+        response = self.auth.make_request("POST", API_URL, request_type="scheduler")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual(self.server.api_calls, 2)
+
+    def test_stale_unauthorized_response_keeps_the_renewed_session(self):
+        self.auth.authenticate()
+
+        def renew_then_reject():
+            if self.server.api_calls > 1:
+                return 200
+            # Another thread renews the session while this request is in flight
+            def renew():
+                with self.auth._auth_lock:
+                    self.auth._authenticated = False
+                self.auth.authenticate()
+            worker = threading.Thread(target=renew)
+            worker.start()
+            worker.join()
+            return 401
+
+        self.server.on_api_call = renew_then_reject
+
+        response = self.auth.make_request("POST", API_URL, request_type="scheduler")
+
+        self.assertEqual(response.status_code, 200)
+        # The 401 belonged to the replaced session, so it must not force a third login
+        self.assertEqual(self.server.logins, 2)
+        self.assertTrue(self.auth._authenticated)
+
+    def test_request_issued_mid_login_waits_for_the_new_session(self):
+        login_window_open = threading.Event()
+        calls_during_login = []
+        results = []
+
+        def concurrent_request():
+            results.append(self.auth.make_request("POST", API_URL, request_type="scheduler"))
+
+        worker = threading.Thread(target=concurrent_request)
+
+        class _PausingSet(set):
+            """Opens a window inside authenticate() after the login steps, before it returns."""
+
+            def clear(self_):
+                super().clear()
+                if worker.ident is None:
+                    login_window_open.set()
+                    worker.start()
+                    time.sleep(0.2)  # Long enough for an unsynchronized reader to send its request
+                    login_window_open.clear()
+
+        self.auth._context_established = _PausingSet()
+
+        def record_api_call():
+            calls_during_login.append(login_window_open.is_set())
+            return 200
+
+        self.server.on_api_call = record_api_call
+
+        self.auth.authenticate()
+        worker.join(timeout=5)
+
+        self.assertEqual([r.status_code for r in results], [200])
+        self.assertEqual(calls_during_login, [False])
+        self.assertEqual(self.server.logins, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()